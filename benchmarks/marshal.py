@@ -0,0 +1,70 @@
+"""
+Compares marshalling a big mod with flask-restx's `models.mod_all` against `serialize_mod_all`.
+
+Run from the repository root with `python -m benchmarks.marshal [iterations] [versions]`. Each
+version of the generated mod has three files. The session is cleared before each run, so both
+paths load the mod from the database like an uncached request would.
+"""
+
+import sys
+import json
+import time
+
+from mcarch.app import create_app, db
+
+class BenchConfig:
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SECRET_KEY = 'bench'
+    STORAGE_BACKEND = 'memory'
+
+def make_mod(versions):
+    from mcarch.model.mod import Mod, ModVersion, ModFile, ModAuthor, GameVersion
+    from mcarch.model.file import StoredFile
+    gvsns = [GameVersion(name='1.{}'.format(i)) for i in range(10)]
+    mod = Mod(name='Big Mod', slug='big', desc='A mod with a lot of versions',
+            authors=[ModAuthor(name='Author {}'.format(i)) for i in range(3)])
+    for i in range(versions):
+        vsn = ModVersion(name='{}.0'.format(i), game_vsns=gvsns[i % 10:i % 10 + 2])
+        for side in ['client', 'server', 'src']:
+            name = 'big-{}.0-{}.jar'.format(i, side)
+            vsn.files.append(ModFile(stored=StoredFile(name=name, sha256=name,
+                b2_path='{}/{}'.format(name, name))))
+        mod.mod_vsns.append(vsn)
+    db.session.add(mod)
+    db.session.commit()
+
+def time_runs(iterations, func):
+    times = []
+    for _ in range(iterations):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return 'min {:.1f}ms, median {:.1f}ms'.format(times[0] * 1000, times[len(times) // 2] * 1000)
+
+def main(iterations, versions):
+    from flask_restx import marshal
+    from mcarch.apis import models
+    from mcarch.apis.serialize import serialize_mod_all
+    from mcarch.model.mod import Mod
+
+    app = create_app(BenchConfig)
+    with app.test_request_context():
+        db.create_all()
+        make_mod(versions)
+        load = lambda: Mod.query.filter_by(slug='big').one()
+
+        restx = json.dumps(marshal(load(), models.mod_all, skip_none=True))
+        fast = json.dumps(serialize_mod_all(load()))
+        assert restx == fast, 'serialize_mod_all output differs from marshal'
+
+        print('{} versions, {} files'.format(versions, versions * 3))
+        print('marshal:           ' + time_runs(iterations,
+            lambda: marshal(load(), models.mod_all, skip_none=True)))
+        print('serialize_mod_all: ' + time_runs(iterations, lambda: serialize_mod_all(load())))
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 200)
@@ -0,0 +1,33 @@
+"""
+Measures how long `create_app` takes, as each worker process pays this when it starts.
+
+Run from the repository root with `python -m benchmarks.startup [iterations]`. B2 is configured
+with dummy keys, which would fail startup if the app tried to contact B2 while starting.
+"""
+
+import sys
+import time
+
+from mcarch.app import create_app
+
+class BenchConfig:
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SECRET_KEY = 'bench'
+    STORAGE_BACKEND = 'b2'
+    B2_KEY_ID = 'bench'
+    B2_APP_KEY = 'bench'
+    B2_BUCKET_NAME = 'bench'
+    B2_PUBLIC_URL = 'https://b2.example.com/file/bench/'
+
+def main(iterations):
+    times = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        create_app(BenchConfig)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    print('create_app x{}: min {:.1f}ms, median {:.1f}ms, max {:.1f}ms'.format(
+        iterations, times[0] * 1000, times[len(times) // 2] * 1000, times[-1] * 1000))
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -19,18 +19,28 @@ from .files import ns as files
 api.add_namespace(files)
 
 from . import models
+from . import snapshot
+from .etag import etag_by_mod_changes
+from .paginate import keyset_page, page_params
+from .cache import cache_response
 
 @api.route("/authors")
 class Authors(Resource):
+    @etag_by_mod_changes
     @api.doc("authors")
+    @page_params
+    @cache_response('mods')
     @api.marshal_with(models.author, skip_none=True, mask='{id, name}')
     def get(self, **kwargs):
         '''Returns a list of mod authors.'''
-        return ModAuthor.query.all()
+        authors, headers = keyset_page(ModAuthor.query, ModAuthor.id)
+        return authors, 200, headers
 
 @api.route("/game_versions")
 class GameVersions(Resource):
+    @etag_by_mod_changes
     @api.doc("game_versions")
+    @cache_response('mods')
     @api.marshal_with(models.game_version, skip_none=True, mask='{id, name}')
     def get(self, **kwargs):
         '''Returns a list of game versions.'''
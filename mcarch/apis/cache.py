@@ -0,0 +1,61 @@
+"""Server side caching of API responses."""
+
+import hashlib
+import functools
+
+from flask import request, current_app as app
+from flask_restx.utils import unpack
+
+from mcarch.app import cache
+from mcarch.util.cache import tag_versions
+
+STATS_KEYS = { 'hits': 'api-cache/hits', 'misses': 'api-cache/misses' }
+
+def api_cache_key(tags):
+    """
+    Returns the cache key of the current request's response.
+
+    Responses vary by path, query string and requested fields, and are replaced when any of
+    `tags` is invalidated.
+    """
+    vary = '{}\n{}\n{}'.format(request.path, sorted(request.args.items(multi=True)),
+            request.headers.get('X-Fields', ''))
+    return 'api/{}/{}'.format(hashlib.sha1(vary.encode('utf-8')).hexdigest(),
+            '/'.join(tag_versions(tags)))
+
+def cache_response(*tags, cache_empty=True):
+    """
+    Decorator caching the marshalled responses of an API method until any of the given tags
+    are invalidated.
+
+    Tags are formatted with the method's URL args, so `'mod/{slug}'` tags the response with the
+    requested mod. This goes right outside `marshal_with`, so marshalling is skipped as well.
+
+    If `cache_empty` is false, responses with an empty body aren't cached. Use this for lookups
+    by arbitrary client input, which would otherwise fill the cache with misses.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapped(*args, **kwargs):
+            key = api_cache_key([tag.format(**request.view_args) for tag in tags])
+            rv = cache.get(key)
+            if rv is not None:
+                cache.cache.inc(STATS_KEYS['hits'])
+                return rv
+            cache.cache.inc(STATS_KEYS['misses'])
+            rv = unpack(func(*args, **kwargs))
+            if cache_empty or rv[0]:
+                cache.set(key, rv, timeout=app.config['API_RESPONSE_CACHE_TIMEOUT'])
+            return rv
+        return wrapped
+    return decorator
+
+def api_cache_stats():
+    """
+    Returns a dict with the number of `hits` and `misses` of the API response cache.
+
+    The counts are only exact with the Redis cache. Other cache backends increment them by
+    getting and setting the count, so concurrent requests can lose increments.
+    """
+    counts = cache.get_many(*STATS_KEYS.values())
+    return { name: count or 0 for name, count in zip(STATS_KEYS.keys(), counts) }
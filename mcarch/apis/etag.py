@@ -0,0 +1,44 @@
+"""Conditional GET support for API endpoints."""
+
+import hashlib
+import functools
+
+from flask import request, current_app as app
+from flask_restx.utils import unpack
+from werkzeug.wrappers import Response
+
+from mcarch.model.counter import ChangeCounter
+
+def mods_etag():
+    """
+    Computes the ETag of the current request's response from the `mods` change counter.
+
+    The response also depends on the requested URL and fields, so they are part of the tag.
+    """
+    key = '{}\n{}\n{}'.format(ChangeCounter.get('mods'), request.full_path,
+            request.headers.get('X-Fields', ''))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+def etag_by_mod_changes(func):
+    """
+    Decorator for API methods whose response only changes when a mod change is logged.
+
+    Adds an ETag and `Cache-Control` header to responses, and answers requests with a matching
+    `If-None-Match` with 304 Not Modified without calling the method.
+
+    This must be the outermost decorator, so that a 304 skips marshalling too.
+    """
+    @functools.wraps(func)
+    def wrapped(*args, **kwargs):
+        etag = mods_etag()
+        headers = {
+            'ETag': '"{}"'.format(etag),
+            'Cache-Control': 'public, max-age={}'.format(app.config['API_CACHE_MAX_AGE']),
+            'Vary': 'X-Fields',
+        }
+        if etag in request.if_none_match:
+            return Response(status=304, headers=headers)
+        data, code, resp_headers = unpack(func(*args, **kwargs))
+        headers.update(resp_headers)
+        return data, code, headers
+    return wrapped
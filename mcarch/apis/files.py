@@ -2,31 +2,75 @@ from . import api
 from . import models
 
 from mcarch.app import db
-from mcarch.model.mod import ModFile
+from mcarch.model.mod import Mod, ModFile, ModVersion
 from mcarch.model.file import StoredFile
-from flask_restx import Resource, fields, reqparse
+from flask import current_app as app
+from flask_restx import Resource, fields, reqparse, marshal, abort
+from sqlalchemy.orm import contains_eager, joinedload
+
+from .paginate import keyset_page, page_params
+from .cache import cache_response
 
 ns = api.namespace('files', 'Provides access to information about files in the archive.')
 
 @ns.route("/by_hash/sha256/<shasum>")
 class FilesByHash(Resource):
     @api.doc("files_by_hash_sha256")
+    @page_params
+    @cache_response('mods', cache_empty=False)
     @api.marshal_with(models.file_with_version, skip_none=True, mask='{}')
     def get(self, shasum, **kwargs):
         '''Returns a list of archived files with the given hash.'''
-        return ModFile.query \
+        query = ModFile.query \
             .join(StoredFile) \
-            .filter(StoredFile.sha256 == shasum, ) \
+            .filter(StoredFile.sha256 == shasum, )
+        files, headers = keyset_page(query, ModFile.id)
+        return files, 200, headers
+
+@ns.route("/by_hash/sha256")
+class FilesByHashes(Resource):
+    @api.doc("files_by_hashes_sha256")
+    @api.expect(models.hash_list, validate=True)
+    @api.response(200, 'Success', fields.Raw(example={
+        "2c42fe4c1e9498aa86fc05da13935b77d169328e2da2365dcf4e17dc76e36d3b": []}))
+    def post(self, **kwargs):
+        '''
+        Returns the archived files with each of the given hashes.
+
+        The response maps each hash to a list of files, which is empty if there are none.
+        Checking many files this way only counts as one request towards the rate limit.
+        '''
+        hashes = list(dict.fromkeys(api.payload['sha256']))
+        if len(hashes) > app.config['API_MAX_BULK_LOOKUP']:
+            abort(400, 'Too many hashes. At most {} can be looked up at once.'
+                    .format(app.config['API_MAX_BULK_LOOKUP']))
+        files = ModFile.query \
+            .join(StoredFile) \
+            .filter(StoredFile.sha256.in_({h.lower() for h in hashes})) \
+            .options(contains_eager(ModFile.stored),
+                     joinedload(ModFile.version).joinedload(ModVersion.mod)
+                        .selectinload(Mod.authors),
+                     joinedload(ModFile.version).selectinload(ModVersion.game_vsns)) \
+            .order_by(ModFile.id) \
             .all()
+        found = {}
+        for f in files:
+            found.setdefault(f.stored.sha256, []) \
+                .append(marshal(f, models.file_with_version, skip_none=True))
+        # Hashes are stored in lowercase. Results are returned under the hashes as they were given.
+        return { h: found.get(h.lower(), []) for h in hashes }
 
 @ns.route("/by_filename/<filename>")
 class FilesByName(Resource):
     @api.doc("files_by_filename")
+    @page_params
+    @cache_response('mods', cache_empty=False)
     @api.marshal_with(models.file_with_version, skip_none=True, mask='{}')
     def get(self, filename, **kwargs):
         '''Returns a list of archived files with the given filename.'''
-        return ModFile.query \
+        query = ModFile.query \
             .join(StoredFile) \
-            .filter(StoredFile.name == filename, ) \
-            .all()
+            .filter(StoredFile.name == filename, )
+        files, headers = keyset_page(query, ModFile.id)
+        return files, 200, headers
 
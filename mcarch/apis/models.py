@@ -5,7 +5,7 @@ from flask_restx import fields
 class ArchiveUrl(fields.Raw):
     def format(self, value):
         if value.should_redist:
-            return value.stored.b2_download_url()
+            return value.stored.download_url()
 
 game_version = api.model('Game Version', {
     'id': fields.Integer(example=19),
@@ -64,6 +64,12 @@ mod = api.model('Mod', {
     'authors': fields.List(fields.Nested(author, skip_none=True))
 }, mask='{slug,name}')
 
+mod_listing = api.inherit('Mod Listing', mod, {
+    'game_versions': fields.List(fields.String(example="b1.7.3"),
+        attribute=lambda m: m.game_versions(),
+        description="Names of the game versions supported by any version of this mod.")
+})
+
 mod_all = api.inherit('Mod Full', mod, {
     'mod_versions': fields.Nested(mod_version_files, attribute='mod_vsns')
 })
@@ -77,3 +83,8 @@ file_with_version = api.inherit('File with Version', mod_file, {
     'mod_version': fields.Nested(mod_version_parent, attribute='version')
 })
 
+hash_list = api.model('Hash List', {
+    'sha256': fields.List(fields.String(
+        example="2c42fe4c1e9498aa86fc05da13935b77d169328e2da2365dcf4e17dc76e36d3b"),
+        required=True, description="SHA-256 hashes of the files to look up.")
+})
@@ -1,21 +1,30 @@
 from . import api
 from . import models
+from .etag import etag_by_mod_changes
+from .paginate import keyset_page, page_params
+from .cache import cache_response
+from .serialize import serialize_mod_all
 
 from mcarch.app import db
 from mcarch.model.mod import Mod
 
-from flask import request
+from flask import request, current_app as app
 from flask_restx import Resource, fields
+from flask_restx.mask import apply as apply_mask
 
 ns = api.namespace('mods', 'Provides access to information about mods in the archive.')
 
 @ns.route("/")
 class ModsList(Resource):
+    @etag_by_mod_changes
     @api.doc("mod_list")
     @api.param('author', 'Optionally filter mods by author name', required=False)
     @api.param('game_version', 'Optionally filter mods by supported game versions', required=False)
-    @api.param('keyword', 'Optionally filter mods by name', required=False)
-    @api.marshal_with(models.mod, skip_none=True, mask='{slug,name}')
+    @api.param('keyword', 'Optionally search mods by name, description, author or file name',
+               required=False)
+    @page_params
+    @cache_response('mods')
+    @api.marshal_with(models.mod_listing, skip_none=True, mask='{slug,name}')
     def get(self, **kwargs):
         '''Returns a list of all available mods.'''
         by_author = request.args.get('author')
@@ -29,12 +38,22 @@ class ModsList(Resource):
         if kw:
             filters['keyword'] = kw
 
-        return Mod.search_query(**filters).all()
+        query = Mod.join_game_versions(Mod.search_query(**filters))
+        mods, headers = keyset_page(query, Mod.id,
+                load=Mod.load_game_versions)
+        return mods, 200, headers
 
 @ns.route("/by_slug/<slug>")
 class ModBySlug(Resource):
+    @etag_by_mod_changes
     @api.doc("mod_info_by_slug")
-    @api.marshal_with(models.mod_all, skip_none=True, mask='{}')
+    @api.response(200, 'Success', models.mod_all)
+    @api.param('X-Fields', 'An optional fields mask', _in='header', format='mask')
+    @cache_response('mod/{slug}')
     def get(self, slug, **kwargs):
         '''Returns info on a specific mod and its versions'''
-        return Mod.query.filter(Mod.slug == slug, Mod.redist == True).first_or_404()
+        mod = Mod.query.filter(Mod.slug == slug, Mod.redist == True).first_or_404()
+        # Mods can be big, so this is serialized from flat rows rather than with marshal_with.
+        data = serialize_mod_all(mod)
+        mask = request.headers.get(app.config['RESTX_MASK_HEADER'])
+        return apply_mask(data, mask, skip=True) if mask else data
@@ -0,0 +1,58 @@
+"""Keyset pagination for API endpoints."""
+
+import base64
+import binascii
+
+from flask import request, current_app as app
+from flask_restx import abort
+
+from . import api
+
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode('after:{}'.format(last_id).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    try:
+        kind, last_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split(':')
+        if kind != 'after': raise ValueError()
+        return int(last_id)
+    except (ValueError, UnicodeError, binascii.Error):
+        abort(400, 'Invalid cursor')
+
+def keyset_page(query, id_col, load=lambda q: q.all()):
+    """
+    Paginates `query` by `id_col` according to the current request's `limit` and `cursor` args.
+
+    Returns `(items, headers)`. If the request has neither arg, all items are returned, so v1
+    clients that don't paginate keep working. Otherwise, up to `limit` items after the cursor
+    are returned, ordered by `id_col`. If there are more, the headers include `X-Next-Cursor`,
+    which is the cursor of the next page.
+
+    `load` is called with the final query and returns the list of items.
+    """
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+    if limit is None and cursor is None:
+        return load(query), {}
+
+    max_limit = app.config['API_MAX_PAGE_SIZE']
+    if limit is None or limit > max_limit: limit = max_limit
+    if limit < 1: abort(400, 'limit must be at least 1')
+
+    query = query.order_by(None).order_by(id_col)
+    if cursor:
+        query = query.filter(id_col > decode_cursor(cursor))
+    # Load one extra item to find out if there's another page.
+    items = load(query.limit(limit + 1))
+    if len(items) > limit:
+        items = items[:limit]
+        return items, {'X-Next-Cursor': encode_cursor(items[-1].id)}
+    return items, {}
+
+def page_params(func):
+    """Decorator documenting the pagination args of an API method using `keyset_page`."""
+    func = api.param('cursor', 'Cursor of the page to return, from the X-Next-Cursor header '
+                     'of the previous page', required=False)(func)
+    func = api.param('limit', 'Paginate the results, returning at most this many per page. '
+                     'Results are ordered by ID when paginated.', type=int, required=False)(func)
+    return func
@@ -0,0 +1,116 @@
+"""
+Serializes mods for the API without going through flask-restx's marshalling.
+
+`serialize_mod_all` builds the same output as marshalling a mod with `models.mod_all`, but from
+a few flat queries instead of the mod's relationships. Marshalling evaluates a field object for
+every attribute of every file, and each relationship it follows is a separate lazy load.
+"""
+
+from collections import OrderedDict
+
+from mcarch.app import db
+from mcarch.model.mod import ModVersion, ModFile, ModAuthor, GameVersion, \
+        authored_by_table, for_game_vsn_table
+from mcarch.model.file import StoredFile
+from mcarch.storage import get_storage
+
+def skip_none(*items):
+    """Returns a dict of the given key value pairs, leaving out those with a value of None."""
+    return OrderedDict((k, v) for k, v in items if v is not None)
+
+def string(value):
+    """Formats a value like `fields.String`."""
+    return str(value) if value is not None else None
+
+def load_mod_rows(mod):
+    """
+    Loads the authors, versions, files and game versions of `mod` as flat rows.
+
+    Returns `(authors, files, game_vsns)`. `files` has a row for every file, joined with its
+    version and stored file, plus a row for each version without files. `game_vsns` has a row
+    for every version's game version.
+    """
+    authors = db.session.query(ModAuthor.id, ModAuthor.name, ModAuthor.desc,
+                ModAuthor.website) \
+        .join(authored_by_table, authored_by_table.c.author_id == ModAuthor.id) \
+        .filter(authored_by_table.c.mod_id == mod.id) \
+        .all()
+    files = db.session.query(ModVersion.id.label('vsn_id'), ModVersion.uuid.label('vsn_uuid'),
+                ModVersion.name.label('vsn_name'), ModVersion.url.label('vsn_url'),
+                ModVersion.desc.label('vsn_desc'),
+                ModFile.id, ModFile.uuid, ModFile.desc, ModFile.page_url, ModFile.redirect_url,
+                ModFile.direct_url, ModFile.redist, ModFile.stored_id,
+                StoredFile.name, StoredFile.sha256, StoredFile.b2_path) \
+        .select_from(ModVersion) \
+        .outerjoin(ModFile, ModFile.version_id == ModVersion.id) \
+        .outerjoin(StoredFile, StoredFile.id == ModFile.stored_id) \
+        .filter(ModVersion.mod_id == mod.id) \
+        .order_by(ModVersion.id, ModFile.id) \
+        .all()
+    game_vsns = db.session.query(for_game_vsn_table.c.mod_vsn_id, GameVersion.id,
+                GameVersion.name) \
+        .join(GameVersion, GameVersion.id == for_game_vsn_table.c.game_vsn_id) \
+        .join(ModVersion, ModVersion.id == for_game_vsn_table.c.mod_vsn_id) \
+        .filter(ModVersion.mod_id == mod.id) \
+        .all()
+    return authors, files, game_vsns
+
+def archive_url(row, storage):
+    """Returns the `archive_url` of a file row, like `models.ArchiveUrl`."""
+    should_redist = row.redist if row.redist is not None \
+        else row.direct_url == "" and row.redirect_url == ""
+    if should_redist and row.stored_id is not None and row.b2_path:
+        return storage.url(row.b2_path)
+    return None
+
+def serialize_mod_all(mod):
+    """
+    Returns `mod` as it would be marshalled with `models.mod_all` and `skip_none=True`.
+
+    The mod's relationships are not used, so the output is built with three queries however big
+    the mod is.
+    """
+    authors, files, game_vsns = load_mod_rows(mod)
+    storage = get_storage()
+
+    gvsns_by_vsn = {}
+    for vsn_id, id, name in game_vsns:
+        gvsns_by_vsn.setdefault(vsn_id, []).append(skip_none(('id', id), ('name', string(name))))
+
+    vsns = OrderedDict()
+    for row in files:
+        vsn = vsns.get(row.vsn_id)
+        if vsn is None:
+            # The versions are nested without `skip_none`, so their fields are always present.
+            # Models made with `api.inherit` list their own fields before their parent's.
+            vsn = vsns[row.vsn_id] = OrderedDict([
+                ('files', []),
+                ('uuid', string(row.vsn_uuid)),
+                ('name', string(row.vsn_name)),
+                ('page_url', string(row.vsn_url)),
+                ('description', string(row.vsn_desc)),
+                ('game_versions', gvsns_by_vsn.get(row.vsn_id, [])),
+            ])
+        if row.id is None: continue
+        vsn['files'].append(skip_none(
+            ('uuid', string(row.uuid)),
+            ('name', string(row.name) if row.stored_id is not None else None),
+            ('sha256', string(row.sha256) if row.stored_id is not None else None),
+            ('description', string(row.desc)),
+            ('page_url', string(row.page_url)),
+            ('redirect_url', string(row.redirect_url)),
+            ('direct_url', string(row.direct_url)),
+            ('archive_url', archive_url(row, storage)),
+        ))
+
+    return skip_none(
+        ('mod_versions', list(vsns.values())),
+        ('uuid', string(mod.uuid)),
+        ('slug', string(mod.slug)),
+        ('name', string(mod.name)),
+        ('description', string(mod.desc)),
+        ('website', string(mod.website)),
+        ('authors', [skip_none(('id', a.id), ('name', string(a.name)),
+                        ('description', string(a.desc)), ('website', string(a.website)))
+                     for a in authors]),
+    )
@@ -0,0 +1,105 @@
+"""
+Precomputed snapshots of the whole catalogue, for mirrors and indexers.
+
+A snapshot is a gzipped NDJSON file with one line per mod, marshalled like the `by_slug`
+endpoint. Snapshots are named after the `mods` change counter and built by `flask snapshot`,
+which should be run after mods change. Requests never build one. They're served the newest
+snapshot there is, even if mods changed since it was built.
+"""
+
+import os
+import glob
+import gzip
+import json
+import tempfile
+
+from flask import current_app as app, send_file
+from flask_restx import Resource, marshal, abort
+
+from . import api
+from . import models
+
+from mcarch.model.mod import Mod
+from mcarch.model.counter import ChangeCounter
+
+# Number of mods loaded from the database at a time while building a snapshot.
+BATCH_SIZE = 200
+
+def snapshot_dir():
+    return app.config['SNAPSHOT_DIR'] or os.path.join(app.instance_path, 'snapshots')
+
+def snapshot_path(counter):
+    """Returns the path of the snapshot taken when the `mods` change counter was `counter`."""
+    return os.path.join(snapshot_dir(), 'mods-{}.ndjson.gz'.format(counter))
+
+def list_snapshots():
+    """Returns the paths of all snapshots that have been built, newest first."""
+    def counter(path):
+        return int(os.path.basename(path).split('-')[1].split('.')[0])
+    paths = glob.glob(os.path.join(snapshot_dir(), 'mods-*.ndjson.gz'))
+    return sorted(paths, key=counter, reverse=True)
+
+def iter_mods():
+    """Yields every redistributable mod with its whole tree loaded, a batch at a time."""
+    last_id = 0
+    while True:
+        batch = Mod.query.filter(Mod.redist == True, Mod.id > last_id) \
+            .options(*Mod.tree_options()) \
+            .order_by(Mod.id).limit(BATCH_SIZE).all()
+        if not batch: return
+        yield from batch
+        last_id = batch[-1].id
+
+def build_snapshot():
+    """
+    Builds a snapshot of the catalogue as it is now and deletes older snapshots, except for the
+    previous one.
+
+    Returns the path of the new snapshot. This needs a request context, as file URLs are built
+    with `url_for` by some storage backends.
+    """
+    counter = ChangeCounter.get('mods')
+    path = snapshot_path(counter)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a temporary file first, so a partly written snapshot is never served.
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+            for mod in iter_mods():
+                obj = marshal(mod, models.mod_all, skip_none=True)
+                f.write(json.dumps(obj, separators=(',', ':')).encode('utf-8'))
+                f.write(b'\n')
+        os.replace(tmp, path)
+    except Exception:
+        os.remove(tmp)
+        raise
+    # Requests that looked up the previous snapshot just before this one was moved into place may
+    # not have opened it yet, so it's kept until the next build.
+    for old in list_snapshots()[2:]:
+        os.remove(old)
+    return path
+
+def current_snapshot():
+    """Returns the path of the newest snapshot, or None if none has been built."""
+    paths = list_snapshots()
+    return paths[0] if paths else None
+
+@api.route("/snapshot")
+class Snapshot(Resource):
+    @api.doc("snapshot")
+    @api.produces(['application/gzip'])
+    def get(self, **kwargs):
+        '''
+        Returns a snapshot of every mod in the archive.
+
+        The snapshot is a gzipped file with one JSON object per line, containing all fields of
+        the mod as returned by `by_slug`. Use this instead of requesting each mod separately.
+        The snapshot is rebuilt periodically, so recent changes may not be in it yet. The
+        response supports `If-None-Match` and `Range` requests.
+        '''
+        path = current_snapshot()
+        if path is None:
+            abort(503, 'No snapshot has been built yet.')
+        return send_file(path, mimetype='application/gzip', as_attachment=True,
+                attachment_filename='mods.ndjson.gz', conditional=True,
+                cache_timeout=app.config['API_CACHE_MAX_AGE'])
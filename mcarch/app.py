@@ -18,10 +18,10 @@ csrf = CSRFProtect()
 cache = Cache()
 limiter = Limiter(key_func=get_remote_address)
 mail = Mail()
-b2api = None
 
 from mcarch import login
 from mcarch.util.flask import register_filters, register_conproc as flaskutil_conproc
+from mcarch.util.upload import UploadRequest
 
 class DefaultConfig(object):
     # Whether we're running the test suite
@@ -30,22 +30,61 @@ class DefaultConfig(object):
     SERV_SESSION_EXPIRE_TIME = timedelta(days=5)
     # Expire time for sessions that haven't completed 2FA
     SERV_PARTIAL_SESSION_EXPIRE_TIME = timedelta(hours=1)
+    # How far a session's last seen date must fall behind before it's updated
+    # in the database. Keeps logged in page views from writing on every request.
+    SERV_SESSION_TOUCH_INTERVAL = timedelta(minutes=1)
     PASSWD_RESET_EXPIRE_TIME = timedelta(hours=1)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     DEPLOYMENT='develop'
     REQUIRE_2FA = True
+    # Where uploaded files are stored. 'b2' stores them in the B2 bucket,
+    # 'local' in the `LOCAL_STORAGE_PATH` directory, and 'memory' only keeps
+    # them until the app exits.
+    STORAGE_BACKEND = 'b2'
     B2_KEY_ID = None
     B2_APP_KEY = None
     B2_BUCKET_NAME = None
+    B2_PUBLIC_URL = None
+    LOCAL_STORAGE_PATH = 'storage'
+    # URL where `LOCAL_STORAGE_PATH` is served from. If not set, the app
+    # serves the files itself.
+    LOCAL_STORAGE_URL = None
     CACHE_TYPE = 'simple'
-    CACHE_DEFAULT_TIMEOUT=300
+    # Cached pages are invalidated when the mods they show change, so they can be kept for a
+    # long time.
+    CACHE_DEFAULT_TIMEOUT = 6 * 60 * 60
+    # How many seconds rendered markdown is kept in the cache. The output only depends on the
+    # input, so this can be long.
+    MARKDOWN_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+    # How many seconds cached page fragments are kept.
+    FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
     # Number of X-Forwarded-For addresses to trust. This should be equal to the
     # number of reverse proxies in front of the app that add to the
     # X-Forwarded-For header.
     TRUST_LEN_X_FORWARDED_FOR = 0
     # Number of files per page in the file browser.
     FILES_PER_PAGE = 100
+    # Number of changes per page in the admin change feed.
+    CHANGES_PER_PAGE = 50
     MAIL_DEFAULT_SENDER = 'noreply@mg.mcarchive.net'
+    # How changes to mods are stored in the change log. 'snapshot' stores a
+    # full copy of the mod for every change. 'delta' only stores what changed,
+    # with a full copy every `LOG_KEYFRAME_INTERVAL` changes.
+    LOG_STORAGE = 'snapshot'
+    LOG_KEYFRAME_INTERVAL = 20
+    # How many seconds API clients may cache responses before checking their
+    # ETag again.
+    API_CACHE_MAX_AGE = 60
+    # How many seconds API responses are cached on the server. They're invalidated when mods
+    # change, so this can be long.
+    API_RESPONSE_CACHE_TIMEOUT = 6 * 60 * 60
+    # Largest page API clients can request from paginated endpoints.
+    API_MAX_PAGE_SIZE = 1000
+    # Most files that can be looked up with one request to the bulk file lookup API.
+    API_MAX_BULK_LOOKUP = 1000
+    # Directory catalogue snapshots served by the API are kept in. Defaults to `snapshots` in
+    # the app's instance folder.
+    SNAPSHOT_DIR = None
     # Rate limit settings
     RATELIMIT_API = '5 per 1 seconds;20 per 1 minutes'
 
@@ -56,6 +95,7 @@ class DevelopmentConfig(object):
 
 def create_app(config_object={}):
     app = Flask(__name__)
+    app.request_class = UploadRequest
     app.config.from_object(DefaultConfig)
 
     if 'MCARCH_CONFIG' in os.environ:
@@ -77,9 +117,9 @@ def create_app(config_object={}):
     register_filters(app)
     register_conprocs(app)
 
-    if 'B2_KEY_ID' in app.config and app.config['B2_KEY_ID']:
-        init_b2(app)
-    else:
+    from mcarch.storage import init_storage
+    init_storage(app)
+    if app.config['STORAGE_BACKEND'] == 'b2' and not app.config['B2_KEY_ID']:
         print('B2_KEY_ID is not set! File uploads will not work properly unless backblaze is configured!')
 
     if app.config['TRUST_LEN_X_FORWARDED_FOR'] > 0:
@@ -93,6 +133,7 @@ def register_extensions(app):
     import mcarch.model.file
     import mcarch.model.user
     import mcarch.model.settings
+    import mcarch.model.counter
     db.init_app(app)
     migrate.init_app(app, db)
     bcrypt.init_app(app)
@@ -104,6 +145,8 @@ def register_extensions(app):
 def register_conprocs(app):
     login.register_conproc(app)
     flaskutil_conproc(app)
+    from mcarch.util.cache import register_conproc as cache_conproc
+    cache_conproc(app)
     @app.context_processor
     def inject():
         return dict(
@@ -127,20 +170,9 @@ def register_blueprints(app):
     app.register_blueprint(admin)
     from mcarch.apis import api_v1
     limiter.limit(app.config['RATELIMIT_API'])(api_v1)
+    # The API doesn't use the login session, so there's no cross-site request to forge, and API
+    # clients have no CSRF token to send.
+    csrf.exempt(api_v1)
     app.register_blueprint(api_v1)
     from mcarch import cli
     cli.register_blueprints(app)
-
-def init_b2(app):
-    global b2api
-    from b2sdk.account_info.in_memory import InMemoryAccountInfo
-    from b2sdk.account_info.sqlite_account_info import SqliteAccountInfo
-    from b2sdk.api import B2Api
-    info = InMemoryAccountInfo()
-    b2api = B2Api(info)
-    b2api.authorize_account('production', app.config['B2_KEY_ID'], app.config['B2_APP_KEY'])
-
-def get_b2bucket():
-    """Gets a reference to the archive's B2 bucket from the B2 API"""
-    return b2api.get_bucket_by_name(current_app.config['B2_BUCKET_NAME'])
-
@@ -4,6 +4,7 @@ from getpass import getpass
 import yaml
 import sys
 import os
+import time
 
 from mcarch.app import db, current_app as app
 from mcarch.model.user import *
@@ -16,6 +17,8 @@ def register_blueprints(app):
     app.register_blueprint(bp)
     from mcarch.cli.file import bp as f
     app.register_blueprint(f)
+    from mcarch.cli.log import bp as l
+    app.register_blueprint(l)
 
 def role_from_str(s):
     strs = dict(
@@ -52,63 +55,109 @@ def add_user(name, email, role):
     print('User {} created'.format(name))
 
 
+@bp.cli.command('snapshot')
+def build_snapshot():
+    """Build the catalogue snapshot served by the API.
+
+    The API keeps serving the previous snapshot until this is run again, so run it after
+    importing mods, and regularly, e.g. from cron, to pick up other changes.
+    """
+    from mcarch.apis.snapshot import build_snapshot
+    start = time.perf_counter()
+    # File URLs may be built with url_for.
+    with app.test_request_context():
+        path = build_snapshot()
+    print("Built snapshot {} in {:.1f}s".format(path, time.perf_counter() - start))
+
+
+# Use libyaml's loader if it's available, as it's much faster.
+YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+def load_yaml(path):
+    """Loads a YAML file. This runs in the worker processes of the import command."""
+    with open(path, 'r') as f:
+        return yaml.load(f, Loader=YamlLoader)
+
 @bp.cli.command('import')
 @click.argument('path')
-def import_old_format(path):
-    """Import JSON files from the old MCArchive metarepo format."""
+@click.option('--jobs', '-j', type=int, default=None,
+        help='Number of processes to parse YAML with. Defaults to the number of CPUs.')
+@click.option('--batch-size', type=int, default=200,
+        help='Number of mods to import in each transaction.')
+def import_old_format(path, jobs, batch_size):
+    """Import YAML files from the old MCArchive metarepo format.
+
+    Mods are committed in batches. If an import stops part way through, running it again skips
+    the mods that were already committed and continues with the rest.
+    """
     from os import listdir
-    from os.path import isdir, isfile, join, splitext
-
-    print("Importing old archive format from {}", path)
-
-    modyaml = {}
-    for name in [f for f in listdir(path) if isfile(join(path, f))]:
-        p = join(path, name)
-        print("Loading YAML {}".format(p))
-        obj = None
-        with open(p, 'r') as f:
-            modyaml[name] = yaml.safe_load(f)
-
-    for _, obj in modyaml.items():
-        vsns = import_game_vsns(obj)
-        for v in vsns: db.session.add(v)
-        db.session.commit()
-
-    for name, obj in modyaml.items():
-        mod = import_mod(obj, splitext(name)[0])
-        db.session.add(mod)
-        db.session.commit()
+    from os.path import isfile, join, splitext
+    from multiprocessing import Pool
+
+    print("Importing old archive format from {}".format(path))
+
+    files = sorted(f for f in listdir(path) if isfile(join(path, f)))
+    done = set(slug for slug, in db.session.query(Mod.slug))
+    names = [n for n in files if splitext(n)[0] not in done]
+    if len(names) < len(files):
+        print("Skipping {} mods which were already imported".format(len(files) - len(names)))
+
+    # Look up existing authors and game versions once rather than once per mod.
+    authors = {a.name: a for a in ModAuthor.query}
+    gvsns = {v.name: v for v in GameVersion.query}
+
+    start = time.perf_counter()
+    count = 0
+    batch = []
+    with Pool(jobs) as pool:
+        objs = pool.imap(load_yaml, [join(path, n) for n in names], chunksize=16)
+        for name, obj in zip(names, objs):
+            mod = import_mod(obj, splitext(name)[0], authors, gvsns)
+            db.session.add(mod)
+            batch.append(mod)
+            if len(batch) >= batch_size or count + len(batch) == len(names):
+                commit_import_batch(batch)
+                count += len(batch)
+                batch = []
+                elapsed = time.perf_counter() - start
+                print("Imported {}/{} mods ({:.1f} mods/s)".format(count, len(names),
+                    count / elapsed))
+
+    print("Import complete: {} mods in {:.1f}s".format(count, time.perf_counter() - start))
+
+def commit_import_batch(mods):
+    """Logs the initial version of each of the given newly imported mods and commits them."""
+    # The mods need IDs before their changes can be logged.
+    db.session.flush()
+    for mod in mods:
         mod.log_change(user=None)
-        db.session.commit()
-
     db.session.commit()
-    print("Import complete")
 
 
-def import_mod(obj, slug):
+def import_mod(obj, slug, authors, gvsns):
+    """Imports a mod from its YAML object.
+
+    `authors` and `gvsns` map names to the `ModAuthor` and `GameVersion`
+    objects to use. New authors and game versions are created and added to
+    them as needed.
+    """
     mod = Mod(slug=slug, name=obj['name'])
     if 'desc' in obj: mod.desc=obj['desc']
     for name in obj['authors']:
-        # Try to find the author in the database.
-        auth = ModAuthor.query.filter_by(name=name).first()
-        if auth is None:
-            # Add a new author to the database.
-            auth = ModAuthor(name=name)
-        mod.authors.append(auth)
+        if name not in authors:
+            authors[name] = ModAuthor(name=name)
+        mod.authors.append(authors[name])
     for vsn in obj['versions']:
-        mod.mod_vsns.append(import_mod_vsn(vsn))
+        mod.mod_vsns.append(import_mod_vsn(vsn, gvsns))
     return mod
 
-def import_mod_vsn(obj):
+def import_mod_vsn(obj, gvsns):
     vsn = ModVersion(name=obj['name'])
     if 'desc' in obj: vsn.desc=obj['desc']
     for name in obj['mcvsn']:
-        # Try to find the game version in the database.
-        gvsn = GameVersion.query.filter_by(name=name).first()
-        if gvsn is None:
-            print("Missing game version {}".format(name))
-            exit(1)
-        vsn.game_vsns.append(gvsn)
+        if name not in gvsns:
+            gvsns[name] = GameVersion(name=name)
+        vsn.game_vsns.append(gvsns[name])
     for mfile in obj['files']:
         vsn.files.append(import_mod_file(mfile))
     return vsn
@@ -132,20 +181,5 @@ def import_b2_stored_file(obj):
     """Imports a StoredFile that's already in the local storage directory."""
     filehash = obj['hash']['digest']
     path = os.path.join(filehash, obj['filename'])
-    print('Import stored file {}'.format(path))
     sfile = StoredFile(name=obj['filename'], sha256=obj['hash']['digest'], b2_path=path)
     return sfile
-
-def import_game_vsns(mod):
-    """Import game versions from a mod."""
-    gvsns = []
-    added = set()
-    for vsn in mod['versions']:
-        for name in vsn['mcvsn']:
-            if name in added: continue
-            gvsn = GameVersion.query.filter_by(name=name).first()
-            if gvsn is None:
-                added.add(name)
-                gvsns.append(GameVersion(name=name))
-    return gvsns
-
@@ -2,11 +2,14 @@
 
 from flask import Blueprint, url_for
 import click
+from sqlalchemy.orm import load_only
 
 from mcarch.app import db
+from mcarch.util.cache import invalidate_on_commit
 from mcarch.model.file import StoredFile
-from mcarch.model.mod import ModFile
-from mcarch.model.mod.logs import LogModFile
+from mcarch.model.counter import ChangeCounter
+from mcarch.model.mod import Mod, ModVersion, ModFile
+from mcarch.model.mod.logs import LogMod, LogModFile
 from mcarch.model.mod.draft import DraftModFile
 
 bp = Blueprint('file', __name__)
@@ -19,54 +22,126 @@ def normalize():
         f.sha256 = f.sha256.lower()
     db.session.commit()
 
+REF_MODELS = [ModFile, LogModFile, DraftModFile]
+# Number of log entries loaded at a time while remapping their deltas.
+DELTA_BATCH_SIZE = 500
+
 @bp.cli.command('dedup')
 @click.option('--pretend/--no-pretend', default=True,
         help="Don't actually do anything, but print what would be done. Defaults to --pretend.")
 @click.option('--verbose/--no-verbose', default=True,
         help="Print more information about what's happening.")
-def dedup(pretend, verbose):
+@click.option('--by', type=click.Choice(['path', 'sha256']), default='path',
+        help="Consider files with the same `b2_path`, or the same `sha256` hash and name, to be "
+             "duplicates. Defaults to path.")
+def dedup(pretend, verbose, by):
     """Remove duplicate `StoredFile` entries from the database.
 
-    Files with the same `b2_path` are considered duplicates.
+    Files with the same `b2_path`, or the same `sha256` and `name` with `--by sha256`, are
+    considered duplicates. The one with the lowest ID that has a stored copy is kept. With
+    `--by sha256`, files stored under a different `b2_path` than the kept one are left alone,
+    so their stored copies stay referenced.
 
-    Any rows referencing them will be consolidated to refer to a single `StoredFile`.
+    Any rows referencing them will be consolidated to refer to a single `StoredFile`, including
+    references in the deltas of log entries. This is done in a single transaction. Everything
+    but the deltas is updated with set-based SQL. The deltas are JSON, so log entries whose
+    delta refers to a stored file are scanned in batches and rewritten.
     """
-    dup_files = db.session.query(db.func.count(StoredFile.b2_path), StoredFile.b2_path) \
-            .filter(StoredFile.b2_path.isnot(None)) \
-            .group_by(StoredFile.b2_path) \
-            .having(db.func.count(StoredFile.b2_path) > 1).all()
+    keys = [StoredFile.b2_path] if by == 'path' else [StoredFile.sha256, StoredFile.name]
+    # Maps the ID of each duplicate file to the ID of the file it's a duplicate of.
+    stored_id = db.case([(StoredFile.b2_path.isnot(None), StoredFile.id)])
+    canon = db.session.query(*[k.label(k.name) for k in keys],
+                db.func.coalesce(db.func.min(stored_id), db.func.min(StoredFile.id))
+                    .label('canon_id')) \
+            .filter(*[k.isnot(None) for k in keys]) \
+            .group_by(*keys) \
+            .having(db.func.count(StoredFile.id) > 1).subquery()
+    canon_file = db.aliased(StoredFile)
+    remap = db.session.query(StoredFile.id.label('dup_id'), canon.c.canon_id) \
+            .join(canon, db.and_(*[k == canon.c[k.name] for k in keys])) \
+            .join(canon_file, canon_file.id == canon.c.canon_id) \
+            .filter(StoredFile.id != canon.c.canon_id) \
+            .filter(db.or_(StoredFile.b2_path.is_(None),
+                           StoredFile.b2_path == canon_file.b2_path)).subquery()
+    dups = dict(db.session.query(remap).all())
 
     if pretend:
         print("This is a pretend run. To dedup for real, use --no-pretend.")
-    if verbose: print("Duplicate files: {}".format(dup_files))
-
-    for _, fpath in dup_files:
-        if verbose: print("De-duplicate path {}".format(fpath))
-        sfiles = StoredFile.query.filter_by(b2_path=fpath).all()
-        # Choose a "canonical" version of the file, which will be the only one
-        # left after de-duplication.
-        canon = sfiles[0]
-        if verbose: print("Canonical file chosen: {}".format(canon))
-        for sfile in sfiles[1:]:
-            if verbose: print("\tClean duplicate file {}".format(sfile))
-            # Find all references to the duplicate file.
-            refs  = ModFile.query.filter_by(stored_id=sfile.id).all()
-            refs += LogModFile.query.filter_by(stored_id=sfile.id).all()
-            refs += DraftModFile.query.filter_by(stored_id=sfile.id).all()
-            for ref in refs:
-                assert ref.stored.b2_path == fpath
-                if verbose:
-                    if ref.version and ref.version.mod:
-                        modname = ref.version.mod.name
-                    else:
-                        modname = "no mod referenced"
-                    print("\t\tRemap reference {} by mod {}".format(ref, modname))
-                if not pretend:
-                    ref.stored = canon
-            if not pretend:
-                print("\tDelete stored file {}".format(sfile))
-                db.session.delete(sfile)
-                db.session.commit()
+    if verbose:
+        for dup_id, canon_id in sorted(dups.items(), key=lambda d: (d[1], d[0])):
+            print("Stored file {} is a duplicate of {}".format(dup_id, canon_id))
+
+    dup_ids = db.select([remap.c.dup_id])
+    # Mods whose pages and API responses show the files being changed.
+    slugs = [slug for slug, in db.session.query(Mod.slug).join(Mod.mod_vsns) \
+            .join(ModVersion.files).filter(ModFile.stored_id.in_(dup_ids)).distinct()]
+
+    for model in REF_MODELS:
+        if pretend:
+            count = model.query.filter(model.stored_id.in_(dup_ids)).count()
+            print("Would remap {} references in {}".format(count, model.__tablename__))
+        else:
+            count = remap_stored(model.__table__, remap)
+            print("Remapped {} references in {}".format(count, model.__tablename__))
+
+    count = remap_deltas(dups, pretend)
+    print("{} {} log entry deltas".format("Would remap" if pretend else "Remapped", count))
+
     if pretend:
+        count = StoredFile.query.filter(StoredFile.id.in_(dup_ids)).count()
+        print("Would delete {} duplicate stored files".format(count))
         print("This was a pretend run. To dedup for real, use --no-pretend.")
+    else:
+        table = StoredFile.__table__
+        count = db.session.execute(table.delete().where(table.c.id.in_(dup_ids))).rowcount
+        if count:
+            ChangeCounter.bump('mods')
+            invalidate_on_commit('mods', *['mod/' + slug for slug in slugs])
+        db.session.commit()
+        print("Deleted {} duplicate stored files".format(count))
+
+def remap_stored(table, remap):
+    """Points the `stored_id` of every row in `table` referencing a duplicate file in `remap` at
+    the canonical file instead. Returns the number of rows changed."""
+    if db.engine.dialect.name == 'postgresql':
+        # Renders as UPDATE ... FROM.
+        stmt = table.update() \
+                .values(stored_id=remap.c.canon_id) \
+                .where(table.c.stored_id == remap.c.dup_id)
+    else:
+        canon_id = db.select([remap.c.canon_id]) \
+                .where(remap.c.dup_id == table.c.stored_id).as_scalar()
+        stmt = table.update() \
+                .values(stored_id=canon_id) \
+                .where(table.c.stored_id.in_(db.select([remap.c.dup_id])))
+    return db.session.execute(stmt).rowcount
+
+def remap_delta(delta, dups):
+    """Returns a copy of a log entry's delta with the IDs of duplicate stored files in `dups`
+    replaced by the IDs of their canonical files."""
+    if isinstance(delta, dict):
+        return {k: dups.get(v, v) if k == 'stored' else remap_delta(v, dups)
+                for k, v in delta.items()}
+    elif isinstance(delta, list):
+        return [remap_delta(v, dups) for v in delta]
+    else:
+        return delta
+
+def remap_deltas(dups, pretend):
+    """Remaps duplicate stored files referenced by the deltas of log entries stored as deltas.
+    Returns the number of entries that reference any.
 
+    Only entries whose delta sets a file's stored file are loaded, a batch at a time."""
+    count = 0
+    if not dups: return count
+    # Deltas are stored as serialized by `json.dumps`.
+    query = LogMod.query.filter(LogMod.keyframe == False,
+                                db.cast(LogMod.delta, db.Text).like('%"stored": %')) \
+            .options(load_only('delta')) \
+            .yield_per(DELTA_BATCH_SIZE)
+    for log in query:
+        delta = remap_delta(log.delta, dups)
+        if delta != log.delta:
+            if not pretend: log.delta = delta
+            count += 1
+    return count
@@ -0,0 +1,52 @@
+"""Command line interface for managing mod change logs."""
+
+from flask import Blueprint
+import click
+
+from mcarch.app import db
+from mcarch.model.mod import Mod
+from mcarch.model.mod.logs import LogMod
+
+bp = Blueprint('log', __name__)
+
+@bp.cli.command('backfill-diffs')
+@click.option('--force/--no-force', default=False,
+        help="Re-generate diffs for log entries that already have one stored.")
+@click.option('--verbose/--no-verbose', default=True,
+        help="Print more information about what's happening.")
+def backfill_diffs(force, verbose):
+    """Store diffs for log entries that were logged before diffs were stored.
+
+    Each entry is diffed against the previous entry for the same mod.
+    """
+    count = 0
+    for mod in Mod.query.all():
+        prev = None
+        for log in mod.logs:
+            if force or log.stored_diff is None:
+                if verbose: print("Store diff for revision {} of {}".format(log.index, mod.name))
+                log.store_diff(prev)
+                count += 1
+            prev = log
+        db.session.commit()
+    print("Stored {} diffs".format(count))
+
+@bp.cli.command('keyframes')
+@click.option('--verbose/--no-verbose', default=True,
+        help="Print more information about what's happening.")
+def make_keyframes(verbose):
+    """Store a full copy of the mod in every log entry stored as a delta.
+
+    This must be done before downgrading past the migration that added delta
+    storage. Set `LOG_STORAGE` back to 'snapshot' first so new entries aren't
+    stored as deltas.
+    """
+    count = 0
+    for mod in Mod.query.all():
+        for log in mod.logs:
+            if not log.keyframe:
+                if verbose: print("Store revision {} of {}".format(log.index, mod.name))
+                log.make_keyframe()
+                count += 1
+        db.session.commit()
+    print("Stored {} keyframes".format(count))
@@ -12,7 +12,7 @@ import uuid
 import functools
 from datetime import datetime
 
-from flask import session, request, redirect, url_for, flash, abort
+from flask import session, request, redirect, url_for, flash, abort, g
 
 from mcarch.app import db, bcrypt
 from mcarch.model.user import User, Session, roles
@@ -67,6 +67,7 @@ def log_out():
 def clear_session():
     session['sessid'] = None
     session['user'] = None
+    g.login_sess = None
 
 def log_in(uname, passwd):
     """Attempts to log in with the given credentials. Returns true on success, false on failure."""
@@ -99,6 +100,7 @@ def create_sess(user):
     # Add the session ID to the flask session cookie.
     session['sessid'] = str(dbsess.sess_id)
     session.permanent = True
+    g.pop('login_sess', None)
 
 def cur_session(only_fully_authed=True):
     """
@@ -108,7 +110,19 @@ def cur_session(only_fully_authed=True):
 
     If `only_fully_authed` is true, only returns sessions where the user either
     has no 2FA set up, or the user has authenticated with their 2nd factor.
+
+    The session is only looked up once per request. Later calls return the same object.
     """
+    if 'login_sess' not in g:
+        g.login_sess = load_session()
+    sess = g.login_sess
+    if sess and only_fully_authed and not sess.authed_2fa:
+        return None
+    return sess
+
+def load_session():
+    """Looks up and validates the current login session in the database. Use `cur_session`
+    instead of calling this directly."""
     if 'sessid' not in session: return None
     sess = Session.query.filter_by(sess_id=session['sessid'], active=True).first()
     if sess:
@@ -126,11 +140,9 @@ def cur_session(only_fully_authed=True):
             clear_session()
             db.session.commit()
             return None
-        elif only_fully_authed and not sess.authed_2fa:
-            return None
-        # Update `last_seen` and `last_ip`.
-        sess.touch()
-        db.session.commit()
+        # Update `last_seen`.
+        if sess.touch():
+            db.session.commit()
     return sess
 
 def cur_user(only_fully_authed=True):
@@ -157,7 +169,13 @@ def register_conproc(app):
     functions within jinja templates:
 
     `cur_user`, `cur_session`
+
+    It also forgets the cached login session at the start of each request.
     """
+    @app.before_request
+    def reset_login_sess():
+        g.pop('login_sess', None)
+
     @app.context_processor
     def inject():
         return dict(
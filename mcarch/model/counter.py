@@ -0,0 +1,26 @@
+from mcarch.app import db
+
+class ChangeCounter(db.Model):
+    """
+    A named counter which is incremented whenever the data it tracks changes.
+
+    The `mods` counter is incremented by `Mod.log_change`. The API derives its ETags from it, so
+    clients can check if anything changed without the mod tables being queried.
+    """
+    __tablename__ = 'change_counter'
+    name = db.Column(db.String(40), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    @staticmethod
+    def get(name):
+        """Returns the current value of the named counter."""
+        value = db.session.query(ChangeCounter.value).filter_by(name=name).scalar()
+        return value or 0
+
+    @staticmethod
+    def bump(name):
+        """Increments the named counter. The change is committed with the current transaction."""
+        updated = ChangeCounter.query.filter_by(name=name) \
+            .update({ChangeCounter.value: ChangeCounter.value + 1}, synchronize_session=False)
+        if not updated:
+            db.session.add(ChangeCounter(name=name, value=1))
@@ -1,36 +1,34 @@
 import os
 import enum
 import hashlib
-from urllib.parse import urljoin, quote as urlquote
 
-from flask import url_for, current_app as app
-
-from mcarch.app import db, get_b2bucket
+from mcarch.app import db
+from mcarch.storage import get_storage
 
 class StoredFile(db.Model):
     """Represents a file stored in some sort of storage medium."""
     __tablename__ = 'stored_file'
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(80), nullable=False)
-    sha256 = db.Column(db.String(130), nullable=False)
+    name = db.Column(db.String(80), nullable=False, index=True)
+    sha256 = db.Column(db.String(130), nullable=False, index=True)
 
     upload_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     upload_by = db.relationship('User')
 
-    # Path to this file within the B2 bucket. Null if file is not on B2.
+    # Path to this file within the storage backend. Null if the file isn't stored.
     b2_path = db.Column(db.String(300), nullable=True)
 
-    def b2_download_url(self):
-        """Gets the URL to download this file from the archive's B2 bucket."""
+    def download_url(self):
+        """Gets the URL to download this file from the archive's storage backend."""
         if self.b2_path:
-            return urljoin(app.config['B2_PUBLIC_URL'], urlquote(self.b2_path))
+            return get_storage().url(self.b2_path)
 
 def gen_b2_path(filename, sha):
-    """Generates the path where a file should be stored in B2 based on name and hash."""
+    """Generates the path where a file should be stored based on name and hash."""
     return os.path.join(sha, filename)
 
 class FileIntegrityException(Exception):
-    """Indicates that a file passed to `upload_b2_file` has a different hash
+    """Indicates that a file passed to `upload_file` has a different hash
     than expected."""
     pass
 
@@ -44,16 +42,18 @@ def sha256_file(path):
             buf = f.read(BUF_SZ)
     return h.hexdigest()
 
-def upload_b2_file(path, name, expect_hash, user=None):
-    """Uploads a local file to B2, adds it to the DB, and returns the StoredFile.
+def upload_file(path, name, expect_hash, user=None, sha256=None, sha1=None):
+    """Uploads a local file to storage, adds it to the DB, and returns the StoredFile.
 
     This adds the StoredFile to the database and does a commit.
 
     @param path: path to the file on disk
-    @param name: name of the file as it should be in B2
+    @param name: name of the file as it should be in storage
     @param user: user to associate the stored file with. Can be None
+    @param sha256: SHA-256 hash of the file if it is already known, to avoid reading it again
+    @param sha1: SHA-1 hash of the file if it is already known. B2 needs this for uploads.
     """
-    fhash = sha256_file(path)
+    fhash = sha256 or sha256_file(path)
     if fhash != expect_hash:
         raise FileIntegrityException('Expected file {} to have hash {} but it has {}'
                 .format(name, expect_hash, fhash))
@@ -62,10 +62,8 @@ def upload_b2_file(path, name, expect_hash, user=None):
     if existing:
         return existing
 
-    bucket = get_b2bucket()
-
     b2path = gen_b2_path(name, fhash)
-    bucket.upload_local_file(path, b2path)
+    get_storage().put(b2path, path, sha1=sha1)
 
     stored = StoredFile(name=name, sha256=fhash, b2_path=b2path, upload_by=user)
     db.session.add(stored)
@@ -1,6 +1,11 @@
+from flask import current_app as app
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
 from .base import *
 from .logs import LogMod, LogModVersion, LogModFile
 from .draft import DraftMod, DraftModVersion, DraftModFile
+from . import search
+from mcarch.model.counter import ChangeCounter
 
 from mcarch.app import db
 
@@ -20,6 +25,15 @@ class Mod(ModBase, db.Model):
     # If this is set to false, the mod will be de-listed.
     redist = db.Column(db.Boolean, nullable=False, default=True)
 
+    # Full-text search document for this mod. On PostgreSQL, this is kept up to date by
+    # database triggers from the mod's name, description, authors and file names.
+    search_vector = db.deferred(db.Column(db.Text().with_variant(TSVECTOR(), 'postgresql'),
+        nullable=True))
+
+    # Names of the game versions this mod supports, if they were loaded by
+    # `search_with_game_versions`.
+    _game_versions = None
+
     @staticmethod
     def search_query(game_vsn=None, author=None, keyword=None,
             include_delisted=False):
@@ -33,22 +47,83 @@ class Mod(ModBase, db.Model):
         if author and len(author) > 0:
             query = query.join(ModAuthor, Mod.authors).filter(ModAuthor.name == author)
         if game_vsn and len(game_vsn) > 0:
-            query = query.join(ModVersion) \
-                                .join(GameVersion, ModVersion.game_vsns) \
-                                .filter(GameVersion.name == game_vsn)
+            # Use EXISTS rather than a join, so mods with several matching versions are only
+            # listed once.
+            query = query.filter(Mod.mod_vsns.any(
+                ModVersion.game_vsns.any(GameVersion.name == game_vsn)))
         if keyword and len(keyword) > 0:
-            query = query.filter(Mod.name.ilike("%"+keyword+"%"))
+            query = Mod.keyword_search(query, keyword)
         return query
 
+    @staticmethod
+    def keyword_search(query, keyword):
+        """
+        Filters the given mod query to mods matching `keyword` in their name, description,
+        authors or file names, ordered by how well they match.
+
+        On PostgreSQL, this uses the full-text `search_vector` and a trigram index on the
+        mod's name. Other databases fall back to substring matching.
+        """
+        pattern = "%"+keyword+"%"
+        if db.engine.dialect.name == 'postgresql':
+            tsquery = db.func.plainto_tsquery('english', keyword)
+            rank = db.func.ts_rank(Mod.search_vector, tsquery) \
+                + db.func.similarity(Mod.name, keyword)
+            return query.filter(db.or_(Mod.search_vector.op('@@')(tsquery),
+                                       Mod.name.ilike(pattern))) \
+                .order_by(rank.desc(), Mod.name)
+        else:
+            in_files = ModVersion.files.any(ModFile.stored.has(StoredFile.name.ilike(pattern)))
+            return query.filter(db.or_(Mod.name.ilike(pattern),
+                                       Mod.desc.ilike(pattern),
+                                       Mod.authors.any(ModAuthor.name.ilike(pattern)),
+                                       Mod.mod_vsns.any(in_files))) \
+                .order_by(db.case([(Mod.name.ilike(pattern), 0)], else_=1), Mod.name)
+
+    @staticmethod
+    def search_with_game_versions(**filters):
+        """
+        Like `search_query`, but returns a list of the mods found with the game
+        versions they support loaded in the same query. Calling `game_versions`
+        on the returned mods doesn't query the database again.
+
+        Takes the same filters as `search_query`.
+        """
+        return Mod.load_game_versions(Mod.join_game_versions(Mod.search_query(**filters)))
+
+    @staticmethod
+    def join_game_versions(query):
+        """
+        Adds the game versions each mod supports to a query for mods. The query must be run
+        with `load_game_versions`.
+        """
+        gvsns = db.session.query(ModVersion.mod_id.label('mod_id'),
+                    group_concat(GameVersion.name).label('names')) \
+            .join(GameVersion, ModVersion.game_vsns) \
+            .group_by(ModVersion.mod_id).subquery()
+        return query.outerjoin(gvsns, gvsns.c.mod_id == Mod.id).add_columns(gvsns.c.names)
+
+    @staticmethod
+    def load_game_versions(query):
+        """Runs a query from `join_game_versions`, returning the list of mods found."""
+        mods = []
+        for mod, names in query.all():
+            mod._game_versions = sorted(set(names.split(',')) if names else [],
+                    key=key_mc_version)
+            mods.append(mod)
+        return mods
+
     def game_versions(self):
         """Returns a list of game versions supported by all the versions of this mod."""
+        if self._game_versions is not None:
+            return self._game_versions
         gvs = GameVersion.query \
             .join(ModVersion, GameVersion.mod_vsns) \
             .filter(ModVersion.mod_id == self.id).all()
         gvsns = set()
         for gv in gvs:
             gvsns.add(gv.name)
-        return sorted(list(gvsns))
+        return sorted(list(gvsns), key=key_mc_version)
 
     def game_versions_str(self):
         """Returns a comma separated string listing the supported game versions for this mod."""
@@ -65,19 +140,31 @@ class Mod(ModBase, db.Model):
         Assigns the change to `user`, and if `approved_by` is not `None`,
         assigns them as the user who approved it.
         """
-        entry = LogMod(user=user, approved_by=approved_by, cur_id=self.id, index=len(self.logs))
-        entry.copy_from(self)
+        prev = self.latest_vsn
+        index = prev.index + 1 if prev else 0
+        entry = LogMod(user=user, approved_by=approved_by, cur_id=self.id, index=index)
+        if prev and app.config['LOG_STORAGE'] == 'delta' \
+                and index % app.config['LOG_KEYFRAME_INTERVAL'] != 0:
+            entry.store_delta(prev, self)
+        else:
+            entry.copy_from(self)
+            entry.store_diff(prev)
         db.session.add(entry)
+        ChangeCounter.bump('mods')
+        from mcarch.util.cache import invalidate_on_commit
+        invalidate_on_commit('mods', 'mod/' + self.slug)
         return entry
 
     @property
     def latest_vsn(self):
-        # FIXME: This could probably be done faster with a DB query.
-        return self.logs[len(self.logs)-1]
+        """Returns the most recent `LogMod` entry for this mod, or `None` if it has none.
+
+        This only loads the latest entry, not the whole `logs` list."""
+        return LogMod.query.filter_by(cur_id=self.id).order_by(LogMod.index.desc()).first()
 
     def make_draft(self, user):
         """Creates a DraftMod based on the latest version of this mod."""
-        latest = self.latest_vsn
+        latest = self.latest_vsn.materialize()
         draft = DraftMod(user=user)
         draft.copy_from(latest)
         return draft
@@ -89,11 +176,11 @@ class Mod(ModBase, db.Model):
         """
         if log.cur_id != self.id:
             raise ValueError('Log entry {} is not for mod {}'.format(log, self))
-        self.copy_from(log)
+        self.copy_from(log.materialize())
 
 class ModVersion(ModVersionBase, db.Model):
     __tablename__ = "mod_version"
-    mod_id = db.Column(db.Integer, db.ForeignKey('mod.id'))
+    mod_id = db.Column(db.Integer, db.ForeignKey('mod.id'), index=True)
     mod = db.relationship("Mod", back_populates="mod_vsns")
     game_vsns = db.relationship(
         "GameVersion",
@@ -106,7 +193,7 @@ class ModVersion(ModVersionBase, db.Model):
 
 class ModFile(ModFileBase, db.Model):
     __tablename__ = "mod_file"
-    version_id = db.Column(db.Integer, db.ForeignKey('mod_version.id'))
+    version_id = db.Column(db.Integer, db.ForeignKey('mod_version.id'), index=True)
     version = db.relationship("ModVersion", back_populates="files")
 
     # Whether we're providing our own download links for this file.
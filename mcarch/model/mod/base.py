@@ -3,6 +3,7 @@ from datetime import datetime, timezone
 from collections import OrderedDict
 
 from sqlalchemy.ext.declarative import declared_attr
+from sqlalchemy.orm import selectinload, joinedload
 
 from mcarch.app import db
 from mcarch.util.copydiff import CopyDiff
@@ -16,7 +17,9 @@ def mk_authored_by_table(mod_table):
         db.Column('mod_id', db.Integer,
             db.ForeignKey('{}.id'.format(mod_table), ondelete='CASCADE'), primary_key=True),
         db.Column('author_id', db.Integer,
-            db.ForeignKey('author.id', ondelete='CASCADE'), primary_key=True)
+            db.ForeignKey('author.id', ondelete='CASCADE'), primary_key=True),
+        # The primary key only covers lookups by mod.
+        db.Index('ix_{}_authored_by_author_id'.format(mod_table), 'author_id'),
     )
 
 def mk_for_game_vsn_table(mod_vsn_table):
@@ -26,8 +29,17 @@ def mk_for_game_vsn_table(mod_vsn_table):
             db.ForeignKey('{}.id'.format(mod_vsn_table), ondelete='CASCADE'), primary_key=True),
         db.Column('game_vsn_id', db.Integer,
             db.ForeignKey('game_version.id', ondelete='CASCADE'), primary_key=True),
+        # The primary key only covers lookups by mod version.
+        db.Index('ix_{}_for_game_version_game_vsn_id'.format(mod_vsn_table), 'game_vsn_id'),
     )
 
+def group_concat(col):
+    """Aggregates the distinct values of `col` into a comma separated string."""
+    if db.engine.dialect.name == 'postgresql':
+        return db.func.string_agg(db.distinct(col), ',')
+    else:
+        return db.func.group_concat(db.distinct(col))
+
 
 #### Mixins for mod tables ####
 # Fields are shared between Mod and LogMod
@@ -58,6 +70,23 @@ class ModBase(CopyDiff):
             (gvsn, sorted(modvsns, key=lambda vsn: key_mod_version(vsn.name), reverse=True))
             for gvsn, modvsns in lst])
 
+    @classmethod
+    def tree_options(cls):
+        """
+        Returns query options that eagerly load the authors, versions, game
+        versions, and files of the queried mods.
+
+        Loading a mod with these lets its whole page render in a constant
+        number of queries, regardless of how many versions and files it has.
+        """
+        vsn = cls.mod_vsns.property.mapper.class_
+        mfile = vsn.files.property.mapper.class_
+        return [
+            selectinload(cls.authors),
+            selectinload(cls.mod_vsns).selectinload(vsn.game_vsns),
+            selectinload(cls.mod_vsns).selectinload(vsn.files).joinedload(mfile.stored),
+        ]
+
     # Methods for CopyDiff
     def copydiff_fields(self): return ['name', 'desc', 'website', 'authors']
     def get_children(self): return self.mod_vsns
@@ -90,7 +119,7 @@ class ModFileBase(CopyDiff):
 
     @declared_attr
     def stored_id(cls):
-        return db.Column(db.Integer, db.ForeignKey('stored_file.id'), nullable=True)
+        return db.Column(db.Integer, db.ForeignKey('stored_file.id'), nullable=True, index=True)
 
     @declared_attr
     def stored(cls):
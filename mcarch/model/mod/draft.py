@@ -4,9 +4,24 @@ from .base import *
 authored_by_table = mk_authored_by_table('draft_mod')
 for_game_vsn_table = mk_for_game_vsn_table('draft_mod_version')
 
+def draft_list_index(name, *cols, where):
+    """Makes a partial index on the draft table which only covers rows matching `where`."""
+    return db.Index(name, *cols, postgresql_where=db.text(where), sqlite_where=db.text(where))
+
 class DraftMod(ModBase, db.Model):
     """Represents pending changes to a mod."""
     __tablename__ = "draft_mod"
+    # Partial indexes for the draft lists, which only show either active or archived drafts.
+    __table_args__ = (
+        draft_list_index('ix_draft_mod_active_time_changed', 'time_changed',
+            where='archived_time IS NULL'),
+        draft_list_index('ix_draft_mod_active_user_id', 'user_id', 'time_changed',
+            where='archived_time IS NULL'),
+        draft_list_index('ix_draft_mod_ready_time', 'ready_time',
+            where='archived_time IS NULL AND ready_time IS NOT NULL'),
+        draft_list_index('ix_draft_mod_archived_time', 'archived_time',
+            where='archived_time IS NOT NULL'),
+    )
 
     # Time this was marked ready for merge by the user. Ready drafts are able
     # to be merged, but cannot be edited.
@@ -132,13 +147,13 @@ class DraftMod(ModBase, db.Model):
     def draft_diff(self):
         """Returns a diff representing changes made in this draft versus its base version."""
         if self.base_vsn:
-            return self.base_vsn.diff(self)
+            return self.base_vsn.materialize().diff(self)
         else:
             return None
 
 class DraftModVersion(ModVersionBase, db.Model):
     __tablename__ = "draft_mod_version"
-    mod_id = db.Column(db.Integer, db.ForeignKey('draft_mod.id'))
+    mod_id = db.Column(db.Integer, db.ForeignKey('draft_mod.id'), index=True)
     mod = db.relationship("DraftMod", back_populates="mod_vsns")
     game_vsns = db.relationship(
         "GameVersion",
@@ -159,7 +174,7 @@ class DraftModVersion(ModVersionBase, db.Model):
 
 class DraftModFile(ModFileBase, db.Model):
     __tablename__ = "draft_mod_file"
-    version_id = db.Column(db.Integer, db.ForeignKey('draft_mod_version.id'))
+    version_id = db.Column(db.Integer, db.ForeignKey('draft_mod_version.id'), index=True)
     version = db.relationship("DraftModVersion", back_populates="files")
 
     # The version of a mod file this draft was made on. If null, this draft represents
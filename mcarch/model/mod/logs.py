@@ -2,23 +2,29 @@
 This module contains models for "logs" which are change submissions for mods.
 """
 
+import uuid
 from datetime import datetime
 from collections import OrderedDict
+from sqlalchemy import inspect
 from sqlalchemy.orm import backref
 
 from .base import *
 
 from mcarch.model.user import User
 from mcarch.app import db
+from mcarch.util.copydiff import ObjDiff, ScalarField, ChildListField
 
 def gen_diffs(mod):
     """
     Takes a mod and generates a list of diffs representing the changes made in each log entry.
+
+    Diffs stored with the log entries are used where available.
     """
     logs = mod.logs
     for i, log in enumerate(logs):
         diff = None
-        if i > 0: diff = logs[i-1].diff(log)
+        if log.stored_diff is not None: diff = diff_from_json(log.stored_diff)
+        elif i > 0: diff = logs[i-1].diff(log)
         else: diff = LogMod().diff(log)
         yield {
             'obj': log,
@@ -28,16 +34,23 @@ def gen_diffs(mod):
             'diff': diff,
         }
 
-def slow_gen_diffs(logs):
+def gen_feed_diffs(logs):
     """
     Unlike regular `gen_diffs`, this takes a list of logs entries that aren't
     all for the same mod, and returns a list of diffs between each one and its
-    previous version. This is probably much slower than `gen_diffs` since it
-    queries the database for the entry previous to each one in the list.
+    previous version.
+
+    Entries without a stored diff are diffed against their previous entry.
+    These are loaded all at once by `load_prev_entries`.
     """
-    for i, log in enumerate(logs):
-        prev = LogMod.query.filter_by(cur_id=log.cur_id, index=log.index-1).first()
-        diff = prev.diff(log) if prev else LogMod().diff(log)
+    logs = list(logs)
+    prevs = load_prev_entries([log for log in logs if log.stored_diff is None])
+    for log in logs:
+        if log.stored_diff is not None:
+            diff = diff_from_json(log.stored_diff)
+        else:
+            prev = prevs.get((log.cur_id, log.index-1))
+            diff = prev.diff(log) if prev else LogMod().diff(log)
         yield {
             'obj': log,
             'user': log.user,
@@ -46,6 +59,178 @@ def slow_gen_diffs(logs):
             'diff': diff,
         }
 
+def load_prev_entries(logs):
+    """
+    Loads the log entry previous to each of the given entries in a single query.
+
+    Returns a dict mapping `(cur_id, index)` to each loaded entry. The trees of
+    the given entries are eagerly loaded by the same query, so they can be
+    diffed against their previous entries without further queries.
+    """
+    keys = set()
+    for log in logs:
+        keys.add((log.cur_id, log.index))
+        if log.index > 0: keys.add((log.cur_id, log.index-1))
+    if not keys: return {}
+    entries = LogMod.query \
+        .filter(db.or_(*[db.and_(LogMod.cur_id == cur_id, LogMod.index == index)
+            for cur_id, index in keys])) \
+        .options(*LogMod.tree_options()).all()
+    return { (e.cur_id, e.index): e for e in entries }
+
+
+#### Stored diffs ####
+# Diffs are stored with each log entry as JSON so the history pages don't
+# need to load and diff the full tree of every revision. Objects referenced by
+# a diff (versions, files, authors, etc.) are stored as references containing
+# just enough information to display them.
+
+class DiffRef(object):
+    """Stands in for an object referenced by a diff that was loaded from JSON.
+
+    Has the `id` and `name` of the object it references, if the object had
+    them when the diff was stored."""
+    def __init__(self, obj):
+        self.__dict__.update(obj)
+
+    def __repr__(self):
+        return '<{} {}>'.format(self.type, getattr(self, 'id', None))
+
+def ref_to_json(obj):
+    ref = {'type': type(obj).__name__}
+    for attr in ['id', 'name']:
+        val = getattr(obj, attr, None)
+        if val is not None: ref[attr] = val
+    return ref
+
+def value_to_json(val):
+    if isinstance(val, db.Model): return ref_to_json(val)
+    elif isinstance(val, list): return [value_to_json(v) for v in val]
+    else: return val
+
+def value_from_json(val):
+    if isinstance(val, dict): return DiffRef(val)
+    elif isinstance(val, list): return [value_from_json(v) for v in val]
+    else: return val
+
+def diff_to_json(diff):
+    """Serializes an `ObjDiff` into a JSON compatible dict that can be loaded with
+    `diff_from_json`."""
+    obj = {
+        'old': ref_to_json(diff.old),
+        'new': ref_to_json(diff.new),
+        'changes': [[f.name, value_to_json(f.old), value_to_json(f.new)] for f in diff.changes],
+    }
+    if diff.children:
+        obj['children'] = {
+            'added': [ref_to_json(ch) for ch in diff.children.added],
+            'removed': [ref_to_json(ch) for ch in diff.children.removed],
+            'changed': [diff_to_json(ch) for ch in diff.children.changed],
+        }
+    return obj
+
+def diff_from_json(obj):
+    """Loads an `ObjDiff` stored with `diff_to_json`.
+
+    Objects referenced by the diff are loaded as `DiffRef`s rather than database objects.
+    """
+    changes = [ScalarField(name, value_from_json(old), value_from_json(new))
+            for name, old, new in obj['changes']]
+    children = None
+    if 'children' in obj:
+        ch = obj['children']
+        children = ChildListField('children',
+                added=[DiffRef(r) for r in ch['added']],
+                removed=[DiffRef(r) for r in ch['removed']],
+                changed=[diff_from_json(c) for c in ch['changed']])
+    return ObjDiff(DiffRef(obj['old']), DiffRef(obj['new']), changes, children)
+
+
+#### Delta storage ####
+# When `LOG_STORAGE` is set to 'delta', most log entries don't store a copy of
+# the mod's tree. They store the changes made since the previous entry in
+# `LogMod.delta` instead, and only every `LOG_KEYFRAME_INTERVAL`th entry is a
+# full copy, or "keyframe". `LogMod.materialize` rebuilds the tree of any entry
+# from the keyframe before it.
+
+def ref_id(val):
+    """Encodes a field value for a delta, replacing database objects with their IDs."""
+    if isinstance(val, db.Model): return val.id
+    elif isinstance(val, list): return [ref_id(v) for v in val]
+    else: return val
+
+def tree_to_delta(obj):
+    """Encodes an object and its children so they can be re-created by `tree_from_delta`."""
+    return {
+        'uuid': str(obj.uuid),
+        'cur_id': obj.id,
+        'fields': {f: ref_id(getattr(obj, f)) for f in obj.copydiff_fields()},
+        'children': [tree_to_delta(ch) for ch in obj.get_children()],
+    }
+
+def diff_to_delta(diff):
+    """Encodes the changes in an `ObjDiff` so they can be applied with `apply_delta`."""
+    delta = {'fields': {f.name: ref_id(f.new) for f in diff.changes}}
+    if diff.children:
+        delta['added'] = [tree_to_delta(ch) for ch in diff.children.added]
+        delta['removed'] = [str(ch.uuid) for ch in diff.children.removed]
+        delta['changed'] = [dict(diff_to_delta(ch), uuid=str(ch.new.uuid))
+            for ch in diff.children.changed]
+    return delta
+
+def set_delta_fields(obj, fields):
+    """Sets fields from a delta on `obj`, loading any database objects they reference by ID."""
+    rels = inspect(type(obj)).relationships
+    for name, val in fields.items():
+        if name in rels and val is not None:
+            cls = rels[name].mapper.class_
+            if isinstance(val, list):
+                objs = {o.id: o for o in cls.query.filter(cls.id.in_(val))} if val else {}
+                val = [objs[v] for v in val]
+            else: val = cls.query.get(val)
+        setattr(obj, name, val)
+
+def tree_from_delta(obj, delta):
+    """Fills in `obj` and its children from a delta made by `tree_to_delta`."""
+    obj.uuid = uuid.UUID(delta['uuid'])
+    obj.cur_id = delta['cur_id']
+    set_delta_fields(obj, delta['fields'])
+    for ch in delta['children']:
+        obj.add_child(tree_from_delta(obj.blank_child(), ch))
+    return obj
+
+def apply_delta(obj, delta):
+    """Applies the changes in a delta made by `diff_to_delta` to `obj` and its children."""
+    set_delta_fields(obj, delta['fields'])
+    index = obj.child_index()
+    for key in delta.get('removed', []):
+        obj.rm_child(index[uuid.UUID(key)])
+    for ch in delta.get('changed', []):
+        apply_delta(index[uuid.UUID(ch['uuid'])], ch)
+    for ch in delta.get('added', []):
+        obj.add_child(tree_from_delta(obj.blank_child(), ch))
+
+def transient_copy(obj):
+    """Copies a log entry and its children into new objects that aren't part
+    of the database session, keeping their IDs."""
+    copy = obj.blank(id=obj.id, uuid=obj.uuid, cur_id=obj.cur_id)
+    for f in obj.copydiff_fields():
+        setattr(copy, f, getattr(obj, f))
+    for ch in obj.get_children():
+        copy.add_child(transient_copy(ch))
+    return copy
+
+def copy_tree(obj, src):
+    """Copies the fields and children of the log entry `src` into `obj`,
+    creating new children that can be added to the database session."""
+    obj.uuid = src.uuid
+    obj.cur_id = src.cur_id
+    for f in src.copydiff_fields():
+        setattr(obj, f, getattr(src, f))
+    for ch in src.get_children():
+        obj.add_child(copy_tree(obj.blank_child(), ch))
+    return obj
+
 
 authored_by_table = mk_authored_by_table('log_mod')
 for_game_vsn_table = mk_for_game_vsn_table('log_mod_version')
@@ -53,6 +238,8 @@ for_game_vsn_table = mk_for_game_vsn_table('log_mod_version')
 class LogMod(ModBase, db.Model):
     """Represents a change made to a mod."""
     __tablename__ = "log_mod"
+    # Prevents two concurrent changes to a mod from being logged with the same index.
+    __table_args__ = (db.UniqueConstraint('cur_id', 'index', name='log_mod_cur_id_index_key'),)
 
     # The user that made this change.
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
@@ -66,7 +253,7 @@ class LogMod(ModBase, db.Model):
     date = db.Column(db.DateTime, default=datetime.utcnow)
 
     cur_id = db.Column(db.Integer, db.ForeignKey('mod.id'), nullable=True)
-    current = db.relationship("Mod", backref=backref("logs", order_by='LogMod.date'))
+    current = db.relationship("Mod", backref=backref("logs", order_by='LogMod.index'))
 
     # Index within this mod's list of versions.
     index = db.Column(db.Integer, nullable=False)
@@ -76,6 +263,77 @@ class LogMod(ModBase, db.Model):
         secondary=authored_by_table)
     mod_vsns = db.relationship("LogModVersion", back_populates="mod")
 
+    # Changes made in this entry versus the previous one, serialized with
+    # `diff_to_json`. Null for entries logged before diffs were stored.
+    stored_diff = db.Column(db.JSON, nullable=True)
+
+    # Whether this entry stores a full copy of the mod. Entries that aren't
+    # keyframes only store the mod's scalar fields themselves, and store
+    # everything else in `delta`. See `materialize`.
+    keyframe = db.Column(db.Boolean, nullable=False, default=True)
+    # Changes made in this entry versus the previous one if this isn't a
+    # keyframe, encoded with `diff_to_delta`.
+    delta = db.Column(db.JSON, nullable=True)
+
+    def store_diff(self, prev):
+        """Diffs this entry against `prev` and stores the result in `stored_diff`.
+
+        `prev` should be the previous log entry for this mod, or `None` if this is the first.
+        """
+        new = self.materialize()
+        diff = prev.materialize().diff(new) if prev else LogMod().diff(new)
+        self.stored_diff = diff_to_json(diff)
+        return diff
+
+    def store_delta(self, prev, mod):
+        """Logs the state of `mod` in this entry as a delta against `prev`,
+        rather than as a full copy."""
+        diff = prev.materialize().diff(mod)
+        self.keyframe = False
+        self.uuid = mod.uuid
+        for f in self.copydiff_fields():
+            if f in inspect(LogMod).column_attrs:
+                setattr(self, f, getattr(mod, f))
+        self.delta = diff_to_delta(diff)
+        self.stored_diff = diff_to_json(diff)
+        return diff
+
+    def materialize(self):
+        """Returns a `LogMod` containing the full tree of this entry.
+
+        For keyframes, this is the entry itself. Otherwise, the tree is rebuilt
+        from the previous keyframe and the deltas after it. The rebuilt
+        objects are not part of the database session and should not be
+        modified or added to it.
+        """
+        # Entries without a delta (including new ones that haven't been
+        # flushed yet) have their own tree.
+        if self.delta is None: return self
+        kf = LogMod.query.filter(LogMod.cur_id == self.cur_id, LogMod.index < self.index,
+                LogMod.keyframe == True) \
+            .order_by(LogMod.index.desc()).options(*LogMod.tree_options()).first()
+        if kf is None:
+            raise ValueError('No keyframe found for log entry {}'.format(self))
+        deltas = LogMod.query.filter(LogMod.cur_id == self.cur_id,
+                LogMod.index > kf.index, LogMod.index <= self.index) \
+            .order_by(LogMod.index).all()
+        tree = transient_copy(kf)
+        for entry in deltas:
+            apply_delta(tree, entry.delta)
+        tree.id = self.id
+        tree.index = self.index
+        tree.date = self.date
+        return tree
+
+    def make_keyframe(self):
+        """Stores the full tree of this entry in the entry itself, so it no
+        longer depends on the entries before it."""
+        if self.keyframe: return
+        tree = self.materialize()
+        copy_tree(self, tree)
+        self.keyframe = True
+        self.delta = None
+
     def blank(self, **kwargs): return LogMod(**kwargs)
     def blank_child(self, **kwargs): return LogModVersion(**kwargs)
     def copy_from(self, other):
@@ -85,7 +343,7 @@ class LogMod(ModBase, db.Model):
 
 class LogModVersion(ModVersionBase, db.Model):
     __tablename__ = "log_mod_version"
-    mod_id = db.Column(db.Integer, db.ForeignKey('log_mod.id'))
+    mod_id = db.Column(db.Integer, db.ForeignKey('log_mod.id'), index=True)
     mod = db.relationship("LogMod", back_populates="mod_vsns")
     game_vsns = db.relationship(
         "GameVersion",
@@ -104,7 +362,7 @@ class LogModVersion(ModVersionBase, db.Model):
 
 class LogModFile(ModFileBase, db.Model):
     __tablename__ = "log_mod_file"
-    version_id = db.Column(db.Integer, db.ForeignKey('log_mod_version.id'))
+    version_id = db.Column(db.Integer, db.ForeignKey('log_mod_version.id'), index=True)
     version = db.relationship("LogModVersion", back_populates="files")
 
     cur_id = db.Column(db.Integer, db.ForeignKey('mod_file.id'), nullable=True)
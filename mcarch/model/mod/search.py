@@ -0,0 +1,102 @@
+"""
+This module sets up the database functions and triggers that keep `Mod.search_vector` up to
+date on PostgreSQL when the tables are created with `db.create_all()`, as the test suite does.
+Databases created with migrations get the same objects from the migrations instead.
+"""
+
+from sqlalchemy import event, DDL
+
+from mcarch.app import db
+
+SEARCH_DDL = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Builds the search document for the mod with the given ID, name and description.
+CREATE OR REPLACE FUNCTION mod_search_vector(integer, text, text) RETURNS tsvector AS $$
+    SELECT setweight(to_tsvector('english', coalesce($2, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce((
+            SELECT string_agg(a.name, ' ') FROM author a
+            JOIN mod_authored_by ab ON ab.author_id = a.id
+            WHERE ab.mod_id = $1), '')), 'B')
+        || setweight(to_tsvector('english', coalesce($3, '')), 'C')
+        || setweight(to_tsvector('simple', coalesce((
+            SELECT string_agg(sf.name, ' ') FROM stored_file sf
+            JOIN mod_file f ON f.stored_id = sf.id
+            JOIN mod_version v ON f.version_id = v.id
+            WHERE v.mod_id = $1), '')), 'D')
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION mod_search_vector_refresh(integer) RETURNS void AS $$
+    UPDATE mod SET search_vector = mod_search_vector(id, name, "desc") WHERE id = $1;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION mod_search_trigger() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := mod_search_vector(NEW.id, NEW.name, NEW."desc");
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION mod_authored_by_search_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM mod_search_vector_refresh(OLD.mod_id);
+    ELSE
+        PERFORM mod_search_vector_refresh(NEW.mod_id);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION mod_file_search_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        PERFORM mod_search_vector_refresh(v.mod_id) FROM mod_version v WHERE v.id = OLD.version_id;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        PERFORM mod_search_vector_refresh(v.mod_id) FROM mod_version v WHERE v.id = NEW.version_id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION author_search_trigger() RETURNS trigger AS $$
+BEGIN
+    PERFORM mod_search_vector_refresh(ab.mod_id) FROM mod_authored_by ab
+        WHERE ab.author_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION stored_file_search_trigger() RETURNS trigger AS $$
+BEGIN
+    PERFORM mod_search_vector_refresh(m.mod_id) FROM (
+        SELECT DISTINCT v.mod_id FROM mod_file f
+        JOIN mod_version v ON f.version_id = v.id
+        WHERE f.stored_id = NEW.id) m;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS mod_search_update ON mod;
+CREATE TRIGGER mod_search_update BEFORE INSERT OR UPDATE OF name, "desc" ON mod
+    FOR EACH ROW EXECUTE PROCEDURE mod_search_trigger();
+DROP TRIGGER IF EXISTS mod_authored_by_search_update ON mod_authored_by;
+CREATE TRIGGER mod_authored_by_search_update AFTER INSERT OR DELETE ON mod_authored_by
+    FOR EACH ROW EXECUTE PROCEDURE mod_authored_by_search_trigger();
+DROP TRIGGER IF EXISTS mod_file_search_update ON mod_file;
+CREATE TRIGGER mod_file_search_update AFTER INSERT OR UPDATE OF stored_id, version_id OR DELETE
+    ON mod_file FOR EACH ROW EXECUTE PROCEDURE mod_file_search_trigger();
+DROP TRIGGER IF EXISTS author_search_update ON author;
+CREATE TRIGGER author_search_update AFTER UPDATE OF name ON author
+    FOR EACH ROW EXECUTE PROCEDURE author_search_trigger();
+DROP TRIGGER IF EXISTS stored_file_search_update ON stored_file;
+CREATE TRIGGER stored_file_search_update AFTER UPDATE OF name ON stored_file
+    FOR EACH ROW EXECUTE PROCEDURE stored_file_search_trigger();
+
+CREATE INDEX IF NOT EXISTS ix_mod_search_vector ON mod USING gin (search_vector);
+CREATE INDEX IF NOT EXISTS ix_mod_name_trgm ON mod USING gin (name gin_trgm_ops);
+"""
+
+# The functions refer to several tables, so they're created once all of the tables exist.
+event.listen(db.metadata, 'after_create', DDL(SEARCH_DDL).execute_if(dialect='postgresql'))
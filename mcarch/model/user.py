@@ -178,10 +178,17 @@ class Session(db.Model):
         self.active = False
 
     def touch(self):
-        """Updates this session's last seen date."""
+        """Updates this session's last seen date.
+
+        Does nothing if it was updated less than `SERV_SESSION_TOUCH_INTERVAL` ago.
+        Returns true if the date was changed.
+        """
         now = datetime.utcnow()
+        if self.last_seen and now - self.last_seen < app.config['SERV_SESSION_TOUCH_INTERVAL']:
+            return False
         self.last_seen = now
         self.user.last_seen = now
+        return True
 
 
 
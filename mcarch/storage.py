@@ -0,0 +1,188 @@
+"""
+This module implements the backends the archive's files can be stored in.
+
+Files are stored under a path generated by `gen_b2_path`, which is saved in `StoredFile.b2_path`.
+The backend is selected with the `STORAGE_BACKEND` config option, and `get_storage` returns the
+app's backend.
+"""
+
+import io
+import os
+import shutil
+import threading
+from urllib.parse import urljoin, quote as urlquote
+
+from flask import url_for, current_app
+
+class StorageBackend(object):
+    """Interface implemented by all storage backends."""
+    # Whether the app's `stored_file` route may serve files from this backend. Backends with a
+    # web server of their own are redirected to instead.
+    served_by_app = False
+
+    def put(self, path, local_path, sha1=None):
+        """Stores the file at `local_path` on disk under `path`.
+
+        If the file's SHA-1 hash is already known, it can be passed in as `sha1` to save backends
+        that need it from reading the file again.
+        """
+        raise NotImplementedError()
+
+    def get(self, path):
+        """Returns a binary file object the file stored under `path` can be read from."""
+        raise NotImplementedError()
+
+    def stat(self, path):
+        """Returns the size in bytes of the file stored under `path`, or None if there is none."""
+        raise NotImplementedError()
+
+    def delete(self, path):
+        """Deletes the file stored under `path`. Does nothing if there is none."""
+        raise NotImplementedError()
+
+    def url(self, path):
+        """Returns a URL the file stored under `path` can be downloaded from."""
+        raise NotImplementedError()
+
+class B2Storage(StorageBackend):
+    """Stores files in the archive's B2 bucket.
+
+    Nothing is sent to B2 until a file is first accessed, so starting the app doesn't wait on or
+    fail because of B2. The authorized API and the bucket are then kept for the life of the
+    process.
+    """
+    def __init__(self, key_id, app_key, bucket_name, public_url):
+        self.key_id = key_id
+        self.app_key = app_key
+        self.bucket_name = bucket_name
+        self.public_url = public_url
+        self._bucket = None
+        self._lock = threading.Lock()
+
+    @property
+    def bucket(self):
+        """The archive's B2 bucket. Authorizes with B2 the first time it's used."""
+        if self._bucket is None:
+            with self._lock:
+                if self._bucket is None:
+                    from b2sdk.account_info.in_memory import InMemoryAccountInfo
+                    from b2sdk.api import B2Api
+                    # b2sdk keeps the key in the account info and re-authorizes by itself when
+                    # the auth token expires.
+                    api = B2Api(InMemoryAccountInfo())
+                    api.authorize_account('production', self.key_id, self.app_key)
+                    self._bucket = api.get_bucket_by_name(self.bucket_name)
+        return self._bucket
+
+    def put(self, path, local_path, sha1=None):
+        self.bucket.upload_local_file(local_path, path, sha1_sum=sha1)
+
+    def get(self, path):
+        from b2sdk.download_dest import DownloadDestBytes
+        dest = DownloadDestBytes()
+        self.bucket.download_file_by_name(path, dest)
+        return io.BytesIO(dest.get_bytes_written())
+
+    def find(self, path):
+        """Returns B2's `FileVersionInfo` for the file stored under `path`, or None if there is
+        none."""
+        # Files are stored in a folder named after their hash, so the folder only holds a few.
+        for info, _ in self.bucket.ls(os.path.dirname(path)):
+            if info.file_name == path: return info
+        return None
+
+    def stat(self, path):
+        info = self.find(path)
+        return info.size if info else None
+
+    def delete(self, path):
+        info = self.find(path)
+        if info:
+            self.bucket.delete_file_version(info.id_, path)
+
+    def url(self, path):
+        return urljoin(self.public_url, urlquote(path))
+
+class LocalStorage(StorageBackend):
+    """Stores files in a directory on the local disk.
+
+    If `public_url` is set, download URLs point there. Otherwise the files are served by the app
+    itself.
+    """
+    served_by_app = True
+
+    def __init__(self, root, public_url=None):
+        self.root = os.path.realpath(root)
+        self.public_url = public_url
+
+    def local_path(self, path):
+        """Returns the path on disk the file stored under `path` is kept at."""
+        full = os.path.realpath(os.path.join(self.root, path))
+        if os.path.commonpath([self.root, full]) != self.root:
+            raise ValueError('Storage path {} is outside the storage directory'.format(path))
+        return full
+
+    def put(self, path, local_path, sha1=None):
+        full = self.local_path(path)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        shutil.copyfile(local_path, full)
+
+    def get(self, path):
+        return open(self.local_path(path), 'rb')
+
+    def stat(self, path):
+        full = self.local_path(path)
+        return os.path.getsize(full) if os.path.isfile(full) else None
+
+    def delete(self, path):
+        full = self.local_path(path)
+        if os.path.isfile(full):
+            os.remove(full)
+
+    def url(self, path):
+        if self.public_url:
+            return urljoin(self.public_url, urlquote(path))
+        return url_for('root.stored_file', path=path)
+
+class MemoryStorage(StorageBackend):
+    """Stores files in memory. Useful for tests and running offline."""
+    served_by_app = True
+
+    def __init__(self):
+        self.files = {}
+
+    def put(self, path, local_path, sha1=None):
+        with open(local_path, 'rb') as f:
+            self.files[path] = f.read()
+
+    def get(self, path):
+        if path not in self.files:
+            raise FileNotFoundError(path)
+        return io.BytesIO(self.files[path])
+
+    def stat(self, path):
+        return len(self.files[path]) if path in self.files else None
+
+    def delete(self, path):
+        self.files.pop(path, None)
+
+    def url(self, path):
+        return url_for('root.stored_file', path=path)
+
+def init_storage(app):
+    """Creates the storage backend selected by the app's config."""
+    backend = app.config['STORAGE_BACKEND']
+    if backend == 'b2':
+        storage = B2Storage(app.config['B2_KEY_ID'], app.config['B2_APP_KEY'],
+                app.config['B2_BUCKET_NAME'], app.config['B2_PUBLIC_URL'])
+    elif backend == 'local':
+        storage = LocalStorage(app.config['LOCAL_STORAGE_PATH'], app.config['LOCAL_STORAGE_URL'])
+    elif backend == 'memory':
+        storage = MemoryStorage()
+    else:
+        raise ValueError('Unknown storage backend {}'.format(backend))
+    app.extensions['mcarch_storage'] = storage
+
+def get_storage():
+    """Gets the current app's storage backend."""
+    return current_app.extensions['mcarch_storage']
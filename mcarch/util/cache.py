@@ -1,8 +1,110 @@
-from flask import request
+import uuid
+import hashlib
 
+from flask import request, Markup, current_app as app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from mcarch.app import db, cache
 from mcarch.login import cur_user
 
 def unless_cur_user(*args, **kwargs):
     """Use as the `unless` for caching. This will skip the cache if the user is logged in."""
     return bool(cur_user())
 
+
+#### Tags ####
+
+# Cached values are tagged with the data they're made from, and include the current version of
+# each of their tags in their keys. Invalidating a tag gives it a new version, so everything
+# tagged with it is looked up under new keys and re-rendered.
+#
+# The tags used are `mods`, for anything listing mods, and `mod/<slug>`, for anything showing a
+# single mod. `Mod.log_change` invalidates both.
+
+def new_tag_version():
+    return uuid.uuid4().hex[:12]
+
+def tag_versions(tags):
+    """Returns a list of the current versions of the given tags."""
+    keys = ['tag/' + tag for tag in tags]
+    vsns = cache.get_many(*keys)
+    # A tag with no version has never been used, or was evicted from the cache. Either way,
+    # nothing cached under its previous version may be used, so it gets a new one.
+    missing = {}
+    for i, (key, vsn) in enumerate(zip(keys, vsns)):
+        if vsn is None:
+            vsns[i] = missing[key] = new_tag_version()
+    if missing:
+        cache.set_many(missing, timeout=0)
+    return vsns
+
+def invalidate_tags(*tags):
+    """Invalidates everything cached with any of the given tags."""
+    cache.set_many({'tag/' + tag: new_tag_version() for tag in tags}, timeout=0)
+
+def invalidate_on_commit(*tags):
+    """
+    Invalidates the given tags once the current transaction is committed.
+
+    Invalidating them earlier could let another request cache the data from before the
+    transaction again.
+    """
+    db.session.info.setdefault('invalidate_tags', set()).update(tags)
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_committed_tags(session):
+    tags = session.info.pop('invalidate_tags', None)
+    if tags:
+        invalidate_tags(*tags)
+
+@event.listens_for(Session, 'after_rollback')
+def forget_rolled_back_tags(session):
+    session.info.pop('invalidate_tags', None)
+
+
+#### Views and fragments ####
+
+def page_cache_key(*tags):
+    """
+    Returns a `key_prefix` function for `cache.cached`, which caches a view until any of the
+    given tags are invalidated.
+
+    Tags are formatted with the view's arguments, so `'mod/{slug}'` is the tag of the mod page
+    being viewed. The keys also include the query string.
+    """
+    def make_key():
+        view_tags = [tag.format(**request.view_args) for tag in tags]
+        args = str(sorted(request.args.items(multi=True))).encode('utf-8')
+        return 'view/{}/{}/{}'.format(request.path, hashlib.md5(args).hexdigest(),
+                '/'.join(tag_versions(view_tags)))
+    return make_key
+
+def cached_fragment(name, *keys, caller, tag='mods', enabled=True):
+    """
+    Caches the output of a template `{% call %}` block, keyed by `name` and `keys`, until
+    `tag` is invalidated.
+
+    Cached fragments are shared by all users, so logged in users, who skip the page cache,
+    still get them. They must not contain anything specific to the current user. If `enabled`
+    is false, the block is rendered without caching.
+    """
+    if not enabled:
+        return caller()
+    key = 'fragment/{}/{}/{}'.format(name, '/'.join(map(str, keys)), tag_versions([tag])[0])
+    html = cache.get(key)
+    if html is None:
+        html = caller()
+        cache.set(key, html, timeout=app.config['FRAGMENT_CACHE_TIMEOUT'])
+    return Markup(html)
+
+def register_conproc(app):
+    """
+    Registers a context processor with the flask app which provides access to the following
+    functions within jinja templates:
+
+    `cached_fragment`
+    """
+    @app.context_processor
+    def inject():
+        return dict(cached_fragment=cached_fragment)
@@ -80,14 +80,16 @@ class CopyDiff(object):
         # Copy changes to this object
         for f in self.copydiff_fields():
             setattr(self, f, getattr(other, f))
+        sindex = self.child_index()
+        oindex = other.child_index()
         # Remove children deleted in other
-        for schild in self.get_children():
-            if not any(map(lambda o: o.same_as(schild), other.get_children())):
+        for key, schild in sindex.items():
+            if key not in oindex:
                 self.rm_child(schild)
         # Copy children and add new children to self
         for ochild in other.get_children():
             # Find a matching child in this object
-            schild = next(filter(lambda s: ochild.same_as(s), self.get_children()), None)
+            schild = sindex.get(ochild.same_key())
             if schild:
                 schild.copy_from(ochild)
             else:
@@ -118,15 +120,18 @@ class CopyDiff(object):
         removed = []
         changed = []
 
+        sindex = self.child_index()
+        nindex = new.child_index()
+
         # List removed children.
-        for schild in self.get_children():
-            if not any(map(lambda n: n.same_as(schild), new.get_children())):
+        for key, schild in sindex.items():
+            if key not in nindex:
                 removed.append(schild)
 
         # List added and changed children
         for nchild in new.get_children():
             # Find a matching child in the old object
-            ochild = self.find_same_child(nchild)
+            ochild = sindex.get(nchild.same_key())
             if ochild:
                 chdiff = ochild.diff(nchild)
                 if not chdiff.is_empty():
@@ -151,6 +156,9 @@ class CopyDiff(object):
                 setattr(self, field, change.new)
         # Apply child changes
         if diff.children:
+            # Index the children before adding any so that lookups below only
+            # see children that existed before the diff was applied.
+            index = self.child_index()
             # Add added children
             for ch in diff.children.added:
                 newch = self.blank_child()
@@ -158,11 +166,11 @@ class CopyDiff(object):
                 self.add_child(newch)
             # Remove removed children
             for ch in diff.children.removed:
-                schild = self.find_same_child(ch)
+                schild = index.get(ch.same_key())
                 if schild: self.rm_child(schild)
             # Change changed children
             for ch in diff.children.changed:
-                schild = self.find_same_child(ch.new)
+                schild = index.get(ch.new.same_key())
                 if schild: schild.apply_diff(ch)
 
     def blank(self, **kwargs):
@@ -175,11 +183,18 @@ class CopyDiff(object):
     def copydiff_fields(self):
         """Returns a list of fields to be copied or diffed"""
         return []
+    def same_key(self):
+        """Returns a hashable key identifying this object.
+
+        Objects that are `same_as` each other must have equal keys. This is
+        used to index children so they can be matched without comparing every
+        pair of children."""
+        return self.uuid
     def same_as(self, other):
         """Checks if this object is the "same" as another.
 
         Objects are the "same" if one is a copy of the other made with `copy_from` or `copy`.  """
-        return self.uuid == other.uuid
+        return self.same_key() == other.same_key()
     def get_children(self): raise NotImplementedError
     def add_child(self, ch): raise NotImplementedError
     def rm_child(self, ch): raise NotImplementedError
@@ -188,3 +203,13 @@ class CopyDiff(object):
         """Finds the first child in self that is `same_as` `other`.`"""
         return next(filter(lambda s: other.same_as(s), self.get_children()), None)
 
+    def child_index(self):
+        """Returns a dict mapping the `same_key` of each child of this object to that child.
+
+        If multiple children have the same key, only the first is included,
+        matching the behavior of `find_same_child`.
+        """
+        index = {}
+        for ch in self.get_children():
+            index.setdefault(ch.same_key(), ch)
+        return index
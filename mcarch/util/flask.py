@@ -2,9 +2,11 @@
 which are exposed for use in jinja templates."""
 
 import bleach
+import hashlib
+import functools
 from markdown import markdown
 from datetime import datetime
-from flask import Markup, request, url_for
+from flask import Markup, request, url_for, current_app
 
 #### Functions ####
 
@@ -72,14 +74,45 @@ BLEACH_WHITELIST = bleach.sanitizer.ALLOWED_TAGS + [
         "p", "h1", "h2", "h3", "h4", "h5", "h6", "br"
     ]
 
+# Number of rendered markdown strings each process keeps in memory.
+MARKDOWN_LRU_SIZE = 4096
+
+def render_markdown(md):
+    """Renders the input as markdown and cleans the output with bleach."""
+    return bleach.clean(markdown(md), tags=BLEACH_WHITELIST)
+
+def markdown_cache_key(md):
+    """Returns the key the output of `render_markdown` for `md` is kept under in the app's cache.
+
+    The key includes the tag whitelist, so output cleaned with a different whitelist by an older
+    version of the app isn't used."""
+    tags = hashlib.sha1(' '.join(sorted(BLEACH_WHITELIST)).encode('utf-8')).hexdigest()[:12]
+    return 'markdown/{}/{}'.format(tags, hashlib.sha1(md.encode('utf-8')).hexdigest())
+
+@functools.lru_cache(maxsize=MARKDOWN_LRU_SIZE)
+def cached_markdown(md):
+    """
+    Like `render_markdown`, but caches the output.
+
+    Recently rendered output is kept in memory, keyed by the input itself. Misses fall back to
+    the app's cache, which is shared between processes when it's Redis, before rendering.
+    """
+    from mcarch.app import cache
+    key = markdown_cache_key(md)
+    html = cache.get(key)
+    if html is None:
+        html = render_markdown(md)
+        cache.set(key, html, timeout=current_app.config['MARKDOWN_CACHE_TIMEOUT'])
+    return html
+
 def safe_markdown(md):
     """
-    This filter renders the input as markdown nd then cleans the output with bleach.
+    This filter renders the input as markdown and then cleans the output with bleach.
 
-    Output will be HTML with only safe, white-listed tags.
+    Output will be HTML with only safe, white-listed tags. Rendered output is cached, as the
+    same descriptions are rendered on every page load.
     """
-    return Markup(bleach.clean(markdown(md),
-        tags=BLEACH_WHITELIST))
+    return Markup(cached_markdown(md))
 
 def register_filters(app):
     app.template_filter('timesince')(timesince)
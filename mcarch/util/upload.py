@@ -0,0 +1,35 @@
+"""Utilities for receiving uploaded files."""
+
+import hashlib
+from tempfile import NamedTemporaryFile
+
+from flask import Request
+
+class HashingFile(object):
+    """
+    A temporary file which hashes everything written to it.
+
+    This is used to store uploaded files, so they are hashed as the request is
+    received instead of being read back from disk afterwards.
+    """
+    def __init__(self):
+        self.file = NamedTemporaryFile('w+b')
+        self.sha256 = hashlib.sha256()
+        self.sha1 = hashlib.sha1()
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.sha1.update(data)
+        return self.file.write(data)
+
+    def __iter__(self):
+        return iter(self.file)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+class UploadRequest(Request):
+    """Request class which receives uploaded files into a `HashingFile`."""
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+            content_length=None):
+        return HashingFile()
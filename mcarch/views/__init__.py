@@ -1,9 +1,11 @@
 import json
+import os
 
 from flask import Blueprint, render_template, url_for, redirect, abort, flash, send_file
 from sqlalchemy.exc import IntegrityError
 
 from mcarch.app import db
+from mcarch.storage import get_storage
 
 root = Blueprint('root', __name__, template_folder="templates")
 
@@ -15,6 +17,17 @@ def home():
 def robots():
     return send_file("templates/robots.txt")
 
+@root.route("/stored/<path:path>")
+def stored_file(path):
+    """Serves files from storage backends that have no web server of their own.
+
+    Other backends are redirected to, so downloads aren't proxied through the app."""
+    storage = get_storage()
+    if not storage.served_by_app: return redirect(storage.url(path))
+    if storage.stat(path) is None: return abort(404)
+    return send_file(storage.get(path), as_attachment=True,
+            attachment_filename=os.path.basename(path))
+
 @root.app_errorhandler(404)
 def err404(err):
     return render_template("error/404.html"), 404
@@ -1,14 +1,16 @@
 from flask import Blueprint, render_template, request, url_for, redirect, flash, \
         current_app as app
 from flask_wtf import FlaskForm
+from sqlalchemy.orm import joinedload
 
 from mcarch.app import db, cache
 from mcarch.login import login_required
 from mcarch.model.mod import ModFile
-from mcarch.model.mod.logs import LogMod, slow_gen_diffs
+from mcarch.model.mod.logs import LogMod, gen_feed_diffs
 from mcarch.model.mod.draft import DraftMod
 from mcarch.model.user import User, Session, roles, UserRole
 from mcarch.model.file import StoredFile
+from mcarch.apis.cache import api_cache_stats
 
 from wtforms import StringField, SelectField, SubmitField
 from wtforms.validators import Length, DataRequired, Email, ValidationError
@@ -20,7 +22,7 @@ admin = Blueprint('admin', __name__, template_folder="templates")
 @login_required(role=roles.archivist, pass_user=True)
 def main(user):
     users = User.query.order_by(User.last_seen.desc()).limit(5).all()
-    changes = slow_gen_diffs(LogMod.query.order_by(LogMod.date.desc()).limit(3).all())
+    changes = gen_feed_diffs(LogMod.query.order_by(LogMod.date.desc()).limit(3).all())
     drafts = DraftMod.query.filter(DraftMod.archived_time.is_(None)) \
         .order_by(DraftMod.time_changed.desc().nullslast()).limit(4).all()
     my_drafts = DraftMod.query.filter(DraftMod.archived_time.is_(None)) \
@@ -30,14 +32,19 @@ def main(user):
         .limit(4).all()
     return render_template('/admin/main.html',
             user=user, users=users, changes=changes,
-            drafts=drafts, my_drafts=my_drafts, ready_drafts=ready_drafts)
+            drafts=drafts, my_drafts=my_drafts, ready_drafts=ready_drafts,
+            api_cache=api_cache_stats())
 
 
 @admin.route("/admin/changes")
 @login_required(role=roles.moderator)
 def changes():
-    changes = slow_gen_diffs(LogMod.query.order_by(LogMod.date.desc()).all())
-    return render_template('/admin/changes.html', changes=changes)
+    pagination = LogMod.query.order_by(LogMod.date.desc(), LogMod.id.desc()) \
+        .options(joinedload(LogMod.current), joinedload(LogMod.user),
+            joinedload(LogMod.approved_by)) \
+        .paginate(per_page=app.config['CHANGES_PER_PAGE'])
+    changes = gen_feed_diffs(pagination.items)
+    return render_template('/admin/changes.html', changes=changes, pagination=pagination)
 
 def orphaned_files():
     """Generates a query that list of all files which do not have a
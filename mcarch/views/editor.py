@@ -1,8 +1,6 @@
 """Views for archivists to edit and manage mods on the archive"""
 
 from typing import Optional
-from tempfile import TemporaryDirectory
-import os
 
 from flask import Blueprint, render_template, request, url_for, redirect, flash, abort
 from flask_wtf import FlaskForm
@@ -16,7 +14,7 @@ import mcarch.notify as notify
 from mcarch.model.mod import Mod, ModVersion, ModFile, ModAuthor, GameVersion
 from mcarch.model.mod.draft import DraftMod, DraftModVersion, DraftModFile
 from mcarch.model.mod.logs import LogMod, LogModVersion, LogModFile
-from mcarch.model.file import upload_b2_file, StoredFile, FileIntegrityException
+from mcarch.model.file import upload_file, StoredFile, FileIntegrityException
 from mcarch.model.user import User, roles
 from mcarch.util.wtforms import BetterSelect, TagInput
 
@@ -48,7 +46,7 @@ def draft_list(user):
 @edit.route('/drafts/<id>')
 @login_required(role=roles.archivist, pass_user=True)
 def draft_page(user, id):
-    draft = DraftMod.query.filter_by(id=id).first_or_404()
+    draft = DraftMod.query.filter_by(id=id).options(*DraftMod.tree_options()).first_or_404()
     vsns = draft.vsns_by_game_vsn()
     return render_template("mods/mod.html", mod=draft, vsns_grouped=vsns, is_draft=True)
 
@@ -339,7 +337,7 @@ class EditFileForm(FlaskForm):
         Gets the `StoredFile` the user selected in the form.
 
         If "Upload File" is selected in `select_file`, this uploads the
-        submitted file to B2, creates a new `StoredFile` in the database, and
+        submitted file to storage, creates a new `StoredFile` in the database, and
         returns that.
         """
         fileid = self.select_file.data
@@ -347,11 +345,17 @@ class EditFileForm(FlaskForm):
         if fileid >= 0:
             return StoredFile.query.get(fileid)
         elif self.file.data:
-            with TemporaryDirectory() as tdir:
-                path = os.path.join(tdir, 'uploaded_file')
-                self.file.data.save(path)
-                return upload_b2_file(path, self.file.data.filename, user=user,
-                            expect_hash=self.file_hash.data)
+            # The upload was hashed into a temporary file as it was received. See `UploadRequest`.
+            stream = self.file.data.stream
+            stream.flush()
+            try:
+                return upload_file(stream.name, self.file.data.filename, user=user,
+                            expect_hash=self.file_hash.data,
+                            sha256=stream.sha256.hexdigest(), sha1=stream.sha1.hexdigest())
+            except FileIntegrityException:
+                # Closing the file deletes it.
+                stream.close()
+                raise
         else:
             return None
 
@@ -7,13 +7,13 @@ from mcarch.model.mod.logs import LogMod, gen_diffs
 from mcarch.model.user import roles
 from mcarch.login import login_required, cur_user, has_role
 from mcarch.util.minecraft import key_mc_version
-from mcarch.util.cache import unless_cur_user
+from mcarch.util.cache import unless_cur_user, page_cache_key
 from mcarch.app import db, cache
 
 modbp = Blueprint('mods', __name__, template_folder="templates")
 
 @modbp.route("/mods")
-@cache.cached(query_string=True, unless=unless_cur_user)
+@cache.cached(key_prefix=page_cache_key('mods'), unless=unless_cur_user)
 def browse():
     by_author = request.args.get('author')
     by_gvsn = request.args.get('gvsn')
@@ -28,13 +28,15 @@ def browse():
         filters['keyword'] = keyword
     # list of filters to be listed on the page
 
-    mods = Mod.search_query(**filters).all()
-    return render_template("mods/browse.html", mods=mods, filters=filters, gvsn=by_gvsn)
+    # The list is a cached fragment, so the mods are only loaded if it isn't cached.
+    load_mods = lambda: Mod.search_with_game_versions(**filters)
+    return render_template("mods/browse.html", load_mods=load_mods, filters=filters,
+            gvsn=by_gvsn)
 
 @modbp.route("/mods/<slug>")
-@cache.cached(query_string=True, unless=unless_cur_user)
+@cache.cached(key_prefix=page_cache_key('mod/{slug}'), unless=unless_cur_user)
 def mod_page(slug):
-    mod = Mod.query.filter_by(slug=slug).first_or_404()
+    mod = Mod.query.filter_by(slug=slug).options(*Mod.tree_options()).first_or_404()
 
     if not mod.redist and not has_role(roles.archivist):
         return abort(404)
@@ -44,7 +46,8 @@ def mod_page(slug):
     if by_gvsn:
         vsns = { by_gvsn: vsns.get(by_gvsn) }
 
-    return render_template("mods/mod.html", mod=mod, vsns_grouped=vsns, by_gvsn=by_gvsn)
+    return render_template("mods/mod.html", mod=mod, vsns_grouped=vsns, by_gvsn=by_gvsn,
+            cache_fragments=True)
 
 
 @modbp.route("/authors")
@@ -69,9 +72,11 @@ def mod_history(slug):
 @login_required(role=roles.archivist)
 def mod_revision(slug, index):
     mod = Mod.query.filter_by(slug=slug).first_or_404()
-    rev = LogMod.query.filter_by(cur_id=mod.id, index=index).first_or_404()
-    vsns = rev.vsns_by_game_vsn()
-    return render_template("mods/mod.html", mod=rev, rev=rev, vsns_grouped=vsns)
+    rev = LogMod.query.filter_by(cur_id=mod.id, index=index) \
+        .options(*LogMod.tree_options()).first_or_404()
+    tree = rev.materialize()
+    vsns = tree.vsns_by_game_vsn()
+    return render_template("mods/mod.html", mod=tree, rev=rev, vsns_grouped=vsns)
 
 @modbp.route("/mods/<slug>/history/<index>/revert", methods=['GET', 'POST'])
 @login_required(role=roles.moderator, pass_user=True)
@@ -86,6 +91,6 @@ def revert_mod(user, slug, index):
         flash('Mod reverted to revision {}'.format(index))
         return redirect(url_for('mods.mod_page', slug=slug))
     else:
-        diff = mod.diff(revto)
+        diff = mod.diff(revto.materialize())
         return render_template("mods/revert_confirm.html", mod=mod, revto=revto, diff=diff)
 
@@ -0,0 +1,23 @@
+"""Store diffs with mod log entries
+
+Revision ID: 3f2b6d0c8e41
+Revises: e529f7080cbd
+Create Date: 2026-10-18 10:12:31.402913
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2b6d0c8e41'
+down_revision = 'e529f7080cbd'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Existing entries are left null. Run `flask log backfill-diffs` to fill them in.
+    op.add_column('log_mod', sa.Column('stored_diff', sa.JSON(), nullable=True))
+
+def downgrade():
+    op.drop_column('log_mod', 'stored_diff')
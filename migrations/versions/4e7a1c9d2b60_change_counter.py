@@ -0,0 +1,27 @@
+"""Add change counters
+
+Revision ID: 4e7a1c9d2b60
+Revises: b5d92c7e4f18
+Create Date: 2026-10-18 17:03:12.440198
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e7a1c9d2b60'
+down_revision = 'b5d92c7e4f18'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    counter = op.create_table('change_counter',
+        sa.Column('name', sa.String(length=40), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(counter, [{'name': 'mods', 'value': 0}])
+
+def downgrade():
+    op.drop_table('change_counter')
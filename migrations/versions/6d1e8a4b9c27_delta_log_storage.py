@@ -0,0 +1,32 @@
+"""Add delta storage for mod log entries
+
+Revision ID: 6d1e8a4b9c27
+Revises: a7c3e19f5b02
+Create Date: 2026-10-18 12:40:09.551730
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6d1e8a4b9c27'
+down_revision = 'a7c3e19f5b02'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('log_mod', sa.Column('keyframe', sa.Boolean(), nullable=False,
+        server_default='true'))
+    op.add_column('log_mod', sa.Column('delta', sa.JSON(), nullable=True))
+
+def downgrade():
+    # Entries stored as deltas have no tree of their own, so dropping the
+    # columns would lose them. `flask log keyframes` stores their trees.
+    deltas = op.get_bind().execute(
+        sa.text("SELECT COUNT(*) FROM log_mod WHERE keyframe = false")).scalar()
+    if deltas:
+        raise RuntimeError("{} log entries are stored as deltas. "
+            "Run `flask log keyframes` before downgrading.".format(deltas))
+    op.drop_column('log_mod', 'delta')
+    op.drop_column('log_mod', 'keyframe')
@@ -0,0 +1,24 @@
+"""Make log entry indices unique per mod
+
+Revision ID: a7c3e19f5b02
+Revises: 3f2b6d0c8e41
+Create Date: 2026-10-18 11:03:47.118254
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e19f5b02'
+down_revision = '3f2b6d0c8e41'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # This will fail if any mod already has two log entries with the same
+    # index. Those need to be renumbered by hand first.
+    op.create_unique_constraint('log_mod_cur_id_index_key', 'log_mod', ['cur_id', 'index'])
+
+def downgrade():
+    op.drop_constraint('log_mod_cur_id_index_key', 'log_mod', type_='unique')
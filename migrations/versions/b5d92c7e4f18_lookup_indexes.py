@@ -0,0 +1,53 @@
+"""Add indexes for common lookups
+
+Revision ID: b5d92c7e4f18
+Revises: c81f4e2d7a93
+Create Date: 2026-10-18 16:21:48.903115
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d92c7e4f18'
+down_revision = 'c81f4e2d7a93'
+branch_labels = None
+depends_on = None
+
+# (index name, table, columns) for plain indexes.
+INDEXES = [
+    ('ix_stored_file_sha256', 'stored_file', ['sha256']),
+    ('ix_stored_file_name', 'stored_file', ['name']),
+]
+for prefix in ['', 'log_', 'draft_']:
+    INDEXES += [
+        ('ix_{}mod_version_mod_id'.format(prefix), prefix+'mod_version', ['mod_id']),
+        ('ix_{}mod_file_version_id'.format(prefix), prefix+'mod_file', ['version_id']),
+        ('ix_{}mod_file_stored_id'.format(prefix), prefix+'mod_file', ['stored_id']),
+        ('ix_{}mod_authored_by_author_id'.format(prefix), prefix+'mod_authored_by',
+            ['author_id']),
+        ('ix_{}mod_version_for_game_version_game_vsn_id'.format(prefix),
+            prefix+'mod_version_for_game_version', ['game_vsn_id']),
+    ]
+
+# (index name, columns, condition) for partial indexes on the draft table.
+DRAFT_INDEXES = [
+    ('ix_draft_mod_active_time_changed', ['time_changed'], 'archived_time IS NULL'),
+    ('ix_draft_mod_active_user_id', ['user_id', 'time_changed'], 'archived_time IS NULL'),
+    ('ix_draft_mod_ready_time', ['ready_time'],
+        'archived_time IS NULL AND ready_time IS NOT NULL'),
+    ('ix_draft_mod_archived_time', ['archived_time'], 'archived_time IS NOT NULL'),
+]
+
+def upgrade():
+    for name, table, cols in INDEXES:
+        op.create_index(name, table, cols)
+    for name, cols, where in DRAFT_INDEXES:
+        op.create_index(name, 'draft_mod', cols, postgresql_where=sa.text(where))
+
+def downgrade():
+    for name, _, _ in reversed(DRAFT_INDEXES):
+        op.drop_index(name, table_name='draft_mod')
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
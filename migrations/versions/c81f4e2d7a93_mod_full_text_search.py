@@ -0,0 +1,113 @@
+"""Add full-text search for mods
+
+Revision ID: c81f4e2d7a93
+Revises: 6d1e8a4b9c27
+Create Date: 2026-10-18 14:02:37.118204
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c81f4e2d7a93'
+down_revision = '6d1e8a4b9c27'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Needs to be run as a user allowed to create extensions.
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column('mod', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+
+    # Builds the search document for the mod with the given ID, name and description.
+    op.execute("""
+CREATE FUNCTION mod_search_vector(integer, text, text) RETURNS tsvector AS $$
+    SELECT setweight(to_tsvector('english', coalesce($2, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce((
+            SELECT string_agg(a.name, ' ') FROM author a
+            JOIN mod_authored_by ab ON ab.author_id = a.id
+            WHERE ab.mod_id = $1), '')), 'B')
+        || setweight(to_tsvector('english', coalesce($3, '')), 'C')
+        || setweight(to_tsvector('simple', coalesce((
+            SELECT string_agg(sf.name, ' ') FROM stored_file sf
+            JOIN mod_file f ON f.stored_id = sf.id
+            JOIN mod_version v ON f.version_id = v.id
+            WHERE v.mod_id = $1), '')), 'D')
+$$ LANGUAGE sql STABLE;
+
+CREATE FUNCTION mod_search_vector_refresh(integer) RETURNS void AS $$
+    UPDATE mod SET search_vector = mod_search_vector(id, name, "desc") WHERE id = $1;
+$$ LANGUAGE sql;
+
+CREATE FUNCTION mod_search_trigger() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := mod_search_vector(NEW.id, NEW.name, NEW."desc");
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION mod_authored_by_search_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM mod_search_vector_refresh(OLD.mod_id);
+    ELSE
+        PERFORM mod_search_vector_refresh(NEW.mod_id);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION mod_file_search_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        PERFORM mod_search_vector_refresh(v.mod_id) FROM mod_version v WHERE v.id = OLD.version_id;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        PERFORM mod_search_vector_refresh(v.mod_id) FROM mod_version v WHERE v.id = NEW.version_id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION author_search_trigger() RETURNS trigger AS $$
+BEGIN
+    PERFORM mod_search_vector_refresh(ab.mod_id) FROM mod_authored_by ab
+        WHERE ab.author_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER mod_search_update BEFORE INSERT OR UPDATE OF name, "desc" ON mod
+    FOR EACH ROW EXECUTE PROCEDURE mod_search_trigger();
+CREATE TRIGGER mod_authored_by_search_update AFTER INSERT OR DELETE ON mod_authored_by
+    FOR EACH ROW EXECUTE PROCEDURE mod_authored_by_search_trigger();
+CREATE TRIGGER mod_file_search_update AFTER INSERT OR UPDATE OF stored_id, version_id OR DELETE
+    ON mod_file FOR EACH ROW EXECUTE PROCEDURE mod_file_search_trigger();
+CREATE TRIGGER author_search_update AFTER UPDATE OF name ON author
+    FOR EACH ROW EXECUTE PROCEDURE author_search_trigger();
+""")
+
+    op.execute('UPDATE mod SET search_vector = mod_search_vector(id, name, "desc")')
+    op.create_index('ix_mod_search_vector', 'mod', ['search_vector'],
+        postgresql_using='gin')
+    op.create_index('ix_mod_name_trgm', 'mod', ['name'],
+        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+def downgrade():
+    op.drop_index('ix_mod_name_trgm', table_name='mod')
+    op.drop_index('ix_mod_search_vector', table_name='mod')
+    op.execute("""
+DROP TRIGGER author_search_update ON author;
+DROP TRIGGER mod_file_search_update ON mod_file;
+DROP TRIGGER mod_authored_by_search_update ON mod_authored_by;
+DROP TRIGGER mod_search_update ON mod;
+DROP FUNCTION author_search_trigger();
+DROP FUNCTION mod_file_search_trigger();
+DROP FUNCTION mod_authored_by_search_trigger();
+DROP FUNCTION mod_search_trigger();
+DROP FUNCTION mod_search_vector_refresh(integer);
+DROP FUNCTION mod_search_vector(integer, text, text);
+""")
+    op.drop_column('mod', 'search_vector')
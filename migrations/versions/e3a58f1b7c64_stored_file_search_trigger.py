@@ -0,0 +1,38 @@
+"""Refresh mod search vectors when stored files are renamed
+
+Revision ID: e3a58f1b7c64
+Revises: 4e7a1c9d2b60
+Create Date: 2026-10-18 21:14:52.803117
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a58f1b7c64'
+down_revision = '4e7a1c9d2b60'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute("""
+CREATE FUNCTION stored_file_search_trigger() RETURNS trigger AS $$
+BEGIN
+    PERFORM mod_search_vector_refresh(m.mod_id) FROM (
+        SELECT DISTINCT v.mod_id FROM mod_file f
+        JOIN mod_version v ON f.version_id = v.id
+        WHERE f.stored_id = NEW.id) m;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER stored_file_search_update AFTER UPDATE OF name ON stored_file
+    FOR EACH ROW EXECUTE PROCEDURE stored_file_search_trigger();
+""")
+
+def downgrade():
+    op.execute("""
+DROP TRIGGER stored_file_search_update ON stored_file;
+DROP FUNCTION stored_file_search_trigger();
+""")
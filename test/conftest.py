@@ -34,9 +34,18 @@ def app():
         CACHE_TYPE = 'null'
         WTF_CSRF_ENABLED = False # disable CSRF protection so we can test forms
         RATELIMIT_ENABLED = False # the test suite exceeds the rate-limits, so disable them
+        STORAGE_BACKEND = 'memory' # keep uploaded files off of B2
+        SNAPSHOT_DIR = tempfile.mkdtemp()
     app = create_app(TestConfig)
     return app
 
+@pytest.fixture
+def simple_cache(app, monkeypatch):
+    """Replaces the test app's null cache with an in-memory one for the duration of a test."""
+    from flask_caching.backends import SimpleCache
+    from mcarch.app import cache
+    monkeypatch.setitem(app.extensions['cache'], cache, SimpleCache())
+
 @pytest.fixture(scope='function')
 def fresh_db(app):
     """A fixture that drops and re-creates the database tables before every test."""
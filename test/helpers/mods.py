@@ -0,0 +1,15 @@
+from mcarch.model.mod import ModVersion, ModFile
+from mcarch.model.file import StoredFile
+
+def add_versions(mod, count, mk_vsn=ModVersion, mk_file=ModFile):
+    """Adds `count` versions with two files each to the given mod."""
+    for i in range(count):
+        mod.mod_vsns.append(mk_vsn(
+            name='9.{}'.format(i),
+            game_vsns=mod.mod_vsns[0].game_vsns,
+            files=[
+                mk_file(stored=StoredFile(name='big-9.{}-{}.jar'.format(i, side),
+                    sha256='fake9{}{}'.format(i, side)))
+                for side in ['client', 'server']
+            ]
+        ))
@@ -0,0 +1,37 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from mcarch.app import db
+
+@contextmanager
+def count_queries():
+    """Records the SQL statements executed inside the `with` block.
+
+    Yields a list which the statements are appended to, so its length is the
+    number of statements executed. Savepoints used by the test suite's
+    transactions are not counted."""
+    stmts = []
+    def before_execute(conn, cursor, statement, *args):
+        if not statement.startswith(('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')):
+            stmts.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', before_execute)
+    try:
+        yield stmts
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_execute)
+
+def query_plan(query):
+    """Returns the database's plan for running a SQLAlchemy query, as a single string.
+
+    On PostgreSQL, sequential scans are disabled first so that tiny test
+    tables don't hide whether an index can be used."""
+    conn = db.session.connection()
+    compiled = query.statement.compile(dialect=conn.dialect)
+    if conn.dialect.name == 'postgresql':
+        conn.execute('SET LOCAL enable_seqscan = off')
+        rows = conn.execute('EXPLAIN ' + str(compiled), compiled.params)
+    else:
+        params = tuple(compiled.params[k] for k in compiled.positiontup)
+        rows = conn.execute('EXPLAIN QUERY PLAN ' + str(compiled), params)
+    return '\n'.join(str(row[-1]) for row in rows)
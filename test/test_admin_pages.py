@@ -68,3 +68,23 @@ def test_edit_user_perms(client, sample_users):
     check_allowed(client, sample_users['moderator'], page, expect=False)
     check_allowed(client, sample_users['admin'], page, expect=True)
 
+
+def test_changes_page(app, client, sample_users, sample_mods, db_session):
+    app.config['CHANGES_PER_PAGE'] = 1
+    sm = sample_mods[0]
+    sm.name = 'changed name'
+    sm.log_change(user=None)
+    db_session.commit()
+    # Make sure entries without stored diffs are still listed.
+    for log in sm.logs: log.stored_diff = None
+    db_session.commit()
+
+    login_as(client, sample_users['moderator'])
+    try:
+        rv = client.get(url_for('admin.changes'))
+        assert b'Revision 1 for changed name' in rv.data
+        assert b'Change name from' in rv.data
+        rv = client.get(url_for('admin.changes', page=3))
+        assert b'Revision 0 for changed name' in rv.data
+    finally:
+        app.config['CHANGES_PER_PAGE'] = 50
@@ -1,5 +1,8 @@
+import gzip
 import json
 
+from helpers.queries import count_queries
+
 def find_by_id(objs, id):
     for obj in objs:
         if obj.id == id: return obj
@@ -33,6 +36,7 @@ def test_mod_list(client, sample_mods):
         assert a['slug'] == match.slug
         assert a['description'] == match.desc
         assert a['website'] == match.website
+        assert a['game_versions'] == match.game_versions()
 
 def test_mod_by_slug(client, sample_mods):
     rv = client.get('/api/v1/mods/by_slug/guide',
@@ -58,3 +62,185 @@ def test_files_by_name(client, sample_mods):
     assert b'guide-4.2.jar' in rv.data
     assert b"Don't Panic" in rv.data
 
+
+def test_etag(client, sample_mods, db_session):
+    db_session.commit()
+    headers = { 'X-Fields': '*' }
+    rv = client.get('/api/v1/mods/by_slug/guide', headers=headers)
+    etag = rv.headers['ETag']
+    assert 'max-age' in rv.headers['Cache-Control']
+
+    with count_queries() as stmts:
+        rv = client.get('/api/v1/mods/by_slug/guide',
+                headers={ 'If-None-Match': etag, **headers })
+    assert rv.status_code == 304
+    assert rv.headers['ETag'] == etag
+    assert not any('FROM mod' in s for s in stmts)
+
+    # Different fields are a different response.
+    rv = client.get('/api/v1/mods/by_slug/guide',
+            headers={ 'If-None-Match': etag, 'X-Fields': 'name' })
+    assert rv.status_code == 200
+
+    sample_mods[1].log_change(user=None)
+    db_session.commit()
+    rv = client.get('/api/v1/mods/by_slug/guide',
+            headers={ 'If-None-Match': etag, **headers })
+    assert rv.status_code == 200
+    assert rv.headers['ETag'] != etag
+    assert json.loads(rv.data)['slug'] == 'guide'
+
+def test_mod_list_paginated(client, sample_mods):
+    headers = { 'X-Fields': '*' }
+    everything = json.loads(client.get('/api/v1/mods/', headers=headers).data)
+    assert len(everything) == len(sample_mods)
+
+    seen = []
+    url = '/api/v1/mods/?limit=1'
+    while url:
+        rv = client.get(url, headers=headers)
+        objs = json.loads(rv.data)
+        assert len(objs) == 1
+        seen += objs
+        cursor = rv.headers.get('X-Next-Cursor')
+        url = '/api/v1/mods/?limit=1&cursor=' + cursor if cursor else None
+    assert sorted(m['uuid'] for m in seen) == sorted(m['uuid'] for m in everything)
+    for m in seen:
+        assert m['game_versions'] == find_by_uuid(sample_mods, m['uuid']).game_versions()
+
+def test_authors_paginated(client, sample_authors):
+    rv = client.get('/api/v1/authors?limit=2')
+    assert len(json.loads(rv.data)) == 2
+    rv = client.get('/api/v1/authors?limit=2&cursor=' + rv.headers['X-Next-Cursor'])
+    assert len(json.loads(rv.data)) == min(2, len(sample_authors) - 2)
+
+def test_bad_cursor(client, sample_mods):
+    rv = client.get('/api/v1/mods/?cursor=garbage')
+    assert rv.status_code == 400
+    rv = client.get('/api/v1/mods/?limit=0')
+    assert rv.status_code == 400
+
+def test_files_by_hashes(client, sample_mods, db_session):
+    db_session.commit()
+    with count_queries() as stmts:
+        rv = client.post('/api/v1/files/by_hash/sha256',
+                json={ 'sha256': ['theanswer', 'theanswer', 'nothing'] })
+    assert rv.status_code == 200
+    obj = json.loads(rv.data)
+    assert obj['nothing'] == []
+    assert len(obj['theanswer']) == 1
+    match = obj['theanswer'][0]
+    assert match['name'] == 'guide-4.2.jar'
+    assert match['mod_version']['mod']['name'] == "Don't Panic"
+    # One query for the files, versions and mods, then one each for authors and game versions.
+    assert len([s for s in stmts if 'mod_file' in s or 'author' in s or 'game_version' in s]) == 3
+
+def test_files_by_hashes_csrf(app, client, sample_mods, db_session, monkeypatch):
+    # API clients have no CSRF token, so the API must work with CSRF protection enabled.
+    monkeypatch.setitem(app.config, 'WTF_CSRF_ENABLED', True)
+    db_session.commit()
+    rv = client.post('/api/v1/files/by_hash/sha256', json={ 'sha256': ['TheAnswer'] })
+    assert rv.status_code == 200
+    obj = json.loads(rv.data)
+    assert obj['TheAnswer'][0]['name'] == 'guide-4.2.jar'
+
+def test_files_by_hashes_invalid(client, sample_mods):
+    rv = client.post('/api/v1/files/by_hash/sha256', json={ 'hashes': ['theanswer'] })
+    assert rv.status_code == 400
+
+def test_snapshot(app, client, sample_mods, db_session, tmp_path, monkeypatch):
+    from mcarch.apis.snapshot import build_snapshot
+    monkeypatch.setitem(app.config, 'SNAPSHOT_DIR', str(tmp_path))
+    rv = client.get('/api/v1/snapshot')
+    assert rv.status_code == 503
+
+    db_session.commit()
+    build_snapshot()
+    rv = client.get('/api/v1/snapshot')
+    assert rv.status_code == 200
+    lines = gzip.decompress(rv.data).decode('utf-8').splitlines()
+    objs = [json.loads(l) for l in lines]
+    assert sorted(o['slug'] for o in objs) == sorted(m.slug for m in sample_mods if m.redist)
+    guide = next(o for o in objs if o['slug'] == 'guide')
+    assert guide['mod_versions'][0]['files'][0]['sha256'] == 'theanswer'
+
+    etag = rv.headers['ETag']
+    rv = client.get('/api/v1/snapshot', headers={ 'If-None-Match': etag })
+    assert rv.status_code == 304
+
+    rv = client.get('/api/v1/snapshot', headers={ 'Range': 'bytes=0-9' })
+    assert rv.status_code == 206
+    assert len(rv.data) == 10
+    rv.close()
+
+    # Changes aren't served until the snapshot is rebuilt.
+    sample_mods[0].log_change(user=None)
+    db_session.commit()
+    rv = client.get('/api/v1/snapshot', headers={ 'If-None-Match': etag })
+    assert rv.status_code == 304
+    build_snapshot()
+    rv = client.get('/api/v1/snapshot', headers={ 'If-None-Match': etag })
+    assert rv.status_code == 200
+    assert rv.headers['ETag'] != etag
+
+    # The previous snapshot is kept, but not the ones before it.
+    sample_mods[0].log_change(user=None)
+    db_session.commit()
+    build_snapshot()
+    assert len(list(tmp_path.glob('mods-*.ndjson.gz'))) == 2
+
+def test_response_cache(client, sample_mods, db_session, simple_cache):
+    from mcarch.apis.cache import api_cache_stats
+    db_session.commit()
+    headers = { 'X-Fields': '*' }
+    first = client.get('/api/v1/mods/?limit=1', headers=headers)
+    with count_queries() as stmts:
+        rv = client.get('/api/v1/mods/?limit=1', headers=headers)
+    assert not any('FROM mod' in s for s in stmts)
+    assert rv.data == first.data
+    assert rv.headers['X-Next-Cursor'] == first.headers['X-Next-Cursor']
+    assert api_cache_stats() == { 'hits': 1, 'misses': 1 }
+
+    # Requests for other fields or pages are cached separately.
+    rv = client.get('/api/v1/mods/?limit=1', headers={ 'X-Fields': 'name' })
+    assert json.loads(rv.data)[0].keys() == {'name'}
+    client.get('/api/v1/mods/?limit=2', headers=headers)
+    assert api_cache_stats() == { 'hits': 1, 'misses': 3 }
+
+    sample_mods[1].name = 'Renamed Mod'
+    sample_mods[1].log_change(user=None)
+    db_session.commit()
+    rv = client.get('/api/v1/mods/by_slug/{}'.format(sample_mods[1].slug), headers=headers)
+    assert json.loads(rv.data)['name'] == 'Renamed Mod'
+    rv = client.get('/api/v1/mods/?limit=2', headers=headers)
+    assert b'Renamed Mod' in rv.data
+    assert api_cache_stats() == { 'hits': 1, 'misses': 5 }
+
+    # File lookups that find nothing aren't cached.
+    for _ in range(2):
+        rv = client.get('/api/v1/files/by_hash/sha256/nothing', headers=headers)
+        assert json.loads(rv.data) == []
+    client.get('/api/v1/files/by_hash/sha256/theanswer', headers=headers)
+    client.get('/api/v1/files/by_hash/sha256/theanswer', headers=headers)
+    assert api_cache_stats() == { 'hits': 2, 'misses': 8 }
+
+def test_serialize_mod_all(app, client, sample_mods, db_session):
+    from flask_restx import marshal
+    from mcarch.apis import models
+    from mcarch.apis.serialize import serialize_mod_all
+    from mcarch.model.mod import ModVersion, ModFile
+    mod = sample_mods[1]
+    # Cover versions without files and files without a stored file.
+    mod.mod_vsns.append(ModVersion(name='empty'))
+    mod.mod_vsns[0].files.append(ModFile(direct_url='https://example.com/a.jar'))
+    db_session.commit()
+
+    def dump(obj): return json.dumps(obj)
+    for m in sample_mods:
+        assert dump(serialize_mod_all(m)) == dump(marshal(m, models.mod_all, skip_none=True))
+
+    for mask in [None, '*', 'name,authors{name}', 'mod_versions{name,files{sha256,archive_url}}']:
+        expected = marshal(mod, models.mod_all, skip_none=True, mask=mask)
+        rv = client.get('/api/v1/mods/by_slug/{}'.format(mod.slug),
+                headers={ 'X-Fields': mask } if mask else {})
+        assert dump(json.loads(rv.data)) == dump(expected)
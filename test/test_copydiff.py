@@ -17,7 +17,7 @@ class ParentObj(CopyDiff):
 
     def blank(self, **kwargs): return TestObj(**kwargs)
     def blank_child(self, **kwargs): return ChildObj(**kwargs)
-    def same_as(self, other): return self.id == other.id
+    def same_key(self): return self.id
     def get_children(self): return self.children
     def add_child(self, ch): self.children.append(ch)
     def rm_child(self, ch): self.children.remove(ch)
@@ -35,7 +35,7 @@ class ChildObj(CopyDiff):
 
     def blank(self, **kwargs): return ChildObj(**kwargs)
     def blank_child(self, **kwargs): return SubChildObj(**kwargs)
-    def same_as(self, other): return self.id == other.id
+    def same_key(self): return self.id
     def get_children(self): return self.children
     def add_child(self, ch): self.children.append(ch)
     def rm_child(self, ch): self.children.remove(ch)
@@ -52,7 +52,7 @@ class SubChildObj(CopyDiff):
 
     def blank(self, **kwargs): return SubChildObj(**kwargs)
     def blank_child(self, **kwargs): return None
-    def same_as(self, other): return self.id == other.id
+    def same_key(self): return self.id
     def get_children(self): return []
 
 
@@ -187,3 +187,53 @@ def test_apply_diff_rm_child():
 
     assert len(appto.children) == 1
 
+
+
+def mk_big_tree(nvsns, nfiles=3, changed=0):
+    """Builds a synthetic mod-like tree with `nvsns` children that each have `nfiles` sub-children.
+
+    The first `changed` children have a different field value, so they show up as changes in a
+    diff against an unchanged tree."""
+    return ParentObj(1, "foo", "bar", 42, [
+        ChildObj(v, "changed" if v <= changed else v, None, None, [
+            SubChildObj(f, f) for f in range(1, nfiles+1)
+        ]) for v in range(1, nvsns+1)
+    ])
+
+def count_key_calls(monkeypatch, func):
+    """Runs `func` and returns the number of times `same_key` was called during it."""
+    calls = [0]
+    for cls in [ParentObj, ChildObj, SubChildObj]:
+        def counted(self, orig=cls.same_key):
+            calls[0] += 1
+            return orig(self)
+        monkeypatch.setattr(cls, 'same_key', counted)
+    func()
+    monkeypatch.undo()
+    return calls[0]
+
+def test_big_tree_linear(monkeypatch):
+    """Runs diff, copy_from and apply_diff on a synthetic 1000-version mod, and
+    checks that the work they do grows linearly with the tree size."""
+    def run(nvsns):
+        old = mk_big_tree(nvsns)
+        new = mk_big_tree(nvsns, changed=nvsns // 2)
+        new.children = new.children[1:] + [ChildObj(nvsns+1, 1, None, None, [])]
+        result = {}
+        def ops():
+            diff = result['diff'] = old.diff(new)
+            mk_big_tree(nvsns).apply_diff(diff)
+            mk_big_tree(nvsns).copy_from(new)
+        result['calls'] = count_key_calls(monkeypatch, ops)
+        return result
+
+    small = run(500)
+    big = run(1000)
+
+    diff = big['diff']
+    assert len(diff.children.added) == 1
+    assert len(diff.children.removed) == 1
+    assert len(diff.children.changed) == 499
+    # Doubling the size of the tree should roughly double the number of
+    # lookups. A quadratic matching algorithm would quadruple them.
+    assert big['calls'] <= small['calls'] * 2.2
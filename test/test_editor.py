@@ -3,12 +3,19 @@ This module contains basic tests that make sure all the pages in the `mods` modu
 major problems.
 """
 
+import io
+import hashlib
+
 from flask import url_for
 
 from mcarch.model.mod import Mod, ModVersion, ModFile, ModAuthor, GameVersion
 from mcarch.model.mod.draft import DraftMod, DraftModVersion, DraftModFile
 from mcarch.model.user import User
+from mcarch.model.file import StoredFile
+from mcarch.storage import get_storage
 from helpers.login import login_as, log_out, check_allowed
+from helpers.queries import count_queries
+from helpers.mods import add_versions
 
 # Makes a draft of the mod and returns the `DraftMod`.
 def mk_draft(db, mod, user=None):
@@ -185,8 +192,38 @@ def test_edit_vsn(db_session, client, sample_users, sample_mods):
     assert vsn.name == data['name']
     assert vsn.desc == data['desc']
 
-# TODO: Test file upload. Need to mock B2 API calls and figure out how to do file uploads in
-# tests first.
+def upload_data(content, fhash):
+    return dict(
+        select_file=-1, file=(io.BytesIO(content), 'upload-test.jar'), file_hash=fhash,
+        desc='Uploaded', page_url='', direct_url='', redirect_url='',
+    )
+
+def test_upload_file(db_session, client, sample_users, sample_mods):
+    mod = mk_draft(db_session, sample_mods[0])
+    vsn = mod.mod_vsns[0]
+    content = b'pretend this is a jar file'
+    fhash = hashlib.sha256(content).hexdigest()
+    login_as(client, sample_users['admin'])
+    client.post(url_for('edit.new_mod_file', id=vsn.id),
+            data=upload_data(content, fhash), follow_redirects=True)
+
+    stored = StoredFile.query.filter_by(name='upload-test.jar').first()
+    assert stored != None, "Uploaded file not found in DB"
+    assert stored.sha256 == fhash
+    assert get_storage().get(stored.b2_path).read() == content
+    assert vsn.files[-1].stored == stored
+
+    rv = client.get(stored.download_url())
+    assert rv.data == content
+
+def test_upload_file_bad_hash(db_session, client, sample_users, sample_mods):
+    mod = mk_draft(db_session, sample_mods[0])
+    vsn = mod.mod_vsns[0]
+    login_as(client, sample_users['admin'])
+    rv = client.post(url_for('edit.new_mod_file', id=vsn.id),
+            data=upload_data(b'corrupted', 'bad'), follow_redirects=True)
+    assert b'Expected file upload-test.jar to have hash bad' in rv.data
+    assert StoredFile.query.filter_by(name='upload-test.jar').first() == None
 
 
 # Test access permissions
@@ -248,3 +285,17 @@ def test_edit_file_perm(db_session, client, sample_users, sample_mod):
     check_allowed(client, sample_users['archivist'], page, expect=True)
     check_allowed(client, sample_users['user'], page, expect=False)
 
+
+def test_draft_page_query_count(client, sample_users, sample_mods, db_session):
+    draft = mk_draft(db_session, sample_mods[1], sample_users['archivist'])
+    page = '/drafts/{}'.format(draft.id)
+    login_as(client, sample_users['archivist'])
+    db_session.commit()
+    with count_queries() as small:
+        client.get(page)
+    add_versions(draft, 10, mk_vsn=DraftModVersion, mk_file=DraftModFile)
+    db_session.commit()
+    with count_queries() as big:
+        rv = client.get(page)
+    assert b'big-9.9-server.jar' in rv.data
+    assert len(big) == len(small)
@@ -5,6 +5,7 @@ import pyotp
 from mcarch.model.user import User, ResetToken
 
 from helpers.login import login_as, assert_no_login
+from helpers.queries import count_queries
 
 
 # Test normal login.
@@ -170,3 +171,19 @@ def test_2fa_reset_expired(client, sample_users, db_session):
     rv = client.get(url_for('user.reset_2fa', token=token))
     assert rv.status_code != 200
 
+
+def test_touch_interval(app, sample_users, client, db_session):
+    user = sample_users['user']
+    login_as(client, user)
+    sess = user.sessions[0]
+    seen = sess.last_seen
+    with count_queries() as stmts:
+        client.get('/')
+    assert not any(s.startswith('UPDATE') for s in stmts)
+    assert sess.last_seen == seen
+
+    sess.last_seen -= app.config['SERV_SESSION_TOUCH_INTERVAL']
+    db_session.commit()
+    client.get('/')
+    assert sess.last_seen > seen
+    assert user.last_seen == sess.last_seen
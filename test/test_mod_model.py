@@ -144,3 +144,264 @@ def test_revert_to(sample_mod, db_session):
     assert sm.mod_vsns[0].files[0].stored.name == logvsn.files[0].stored.name
     assert len(sm.mod_vsns) == len(sm.logs[0].mod_vsns)
 
+
+def test_stored_diff(sample_mod, db_session):
+    from mcarch.model.mod.logs import diff_from_json
+    sm = sample_mod
+
+    sm.name = 'changed'
+    sm.mod_vsns[0].desc = 'changed'
+    del sm.mod_vsns[1]
+    log = sm.log_change(user=None)
+    db_session.commit()
+
+    diff = diff_from_json(log.stored_diff)
+    assert diff.get('name').old == sm.logs[0].name
+    assert diff.get('name').new == 'changed'
+    assert diff.children.changed[0].get('desc').new == 'changed'
+    assert diff.children.changed[0].old.id == sm.logs[0].mod_vsns[0].id
+    assert diff.children.removed[0].name == sm.logs[0].mod_vsns[1].name
+
+def test_backfill_diffs(app, sample_mod, db_session):
+    sm = sample_mod
+    sm.name = 'changed'
+    sm.log_change(user=None)
+    db_session.commit()
+    for log in sm.logs: log.stored_diff = None
+    db_session.commit()
+
+    result = app.test_cli_runner().invoke(args=['log', 'backfill-diffs'])
+    assert 'Stored 2 diffs' in result.output
+    assert sm.logs[0].stored_diff['changes'][0] == ['name', None, 'Test']
+    assert sm.logs[1].stored_diff['changes'][0] == ['name', 'Test', 'changed']
+
+def write_import_yaml(path, slug, authors, gvsn):
+    path.joinpath(slug + '.yaml').write_text("""
+name: {slug}
+authors: [{authors}]
+versions:
+  - name: '1.0'
+    mcvsn: [{gvsn}]
+    files:
+      - filename: {slug}.jar
+        hash: {{digest: hash-{slug}}}
+        urls: [{{type: page, url: 'https://example.com'}}]
+""".format(slug=slug, authors=', '.join(authors), gvsn=gvsn))
+
+def test_import(app, sample_mods, db_session, tmp_path):
+    write_import_yaml(tmp_path, 'first', ['tester', 'New Author'], 'b1.7.3')
+    write_import_yaml(tmp_path, 'second', ['New Author'], 'b1.8')
+    write_import_yaml(tmp_path, 'third', ['tester'], 'b1.8')
+
+    cli = app.test_cli_runner()
+    result = cli.invoke(args=['import', str(tmp_path), '--jobs', '1', '--batch-size', '2'])
+    assert 'Import complete: 3 mods' in result.output
+    first = Mod.query.filter_by(slug='first').one()
+    third = Mod.query.filter_by(slug='third').one()
+    assert [a.name for a in first.authors] == ['tester', 'New Author']
+    assert ModAuthor.query.filter_by(name='tester').count() == 1
+    assert ModAuthor.query.filter_by(name='New Author').count() == 1
+    assert GameVersion.query.filter_by(name='b1.8').count() == 1
+    assert third.mod_vsns[0].files[0].stored.b2_path == 'hash-third/third.jar'
+    assert third.logs[0].name == 'third'
+
+    # Running it again resumes, skipping everything already imported.
+    write_import_yaml(tmp_path, 'fourth', ['tester'], 'b1.8')
+    result = cli.invoke(args=['import', str(tmp_path), '--jobs', '1'])
+    assert 'Skipping 3 mods' in result.output
+    assert 'Import complete: 1 mods' in result.output
+    assert Mod.query.filter_by(slug='fourth').count() == 1
+
+def test_load_prev_entries(sample_mods, db_session):
+    from mcarch.model.mod.logs import load_prev_entries
+    sm = sample_mods[0]
+    sm.name = 'changed'
+    log = sm.log_change(user=None)
+    db_session.commit()
+
+    logs = [log, sample_mods[1].logs[0]]
+    prevs = load_prev_entries(logs)
+    assert prevs[(sm.id, 0)] == sm.logs[0]
+    assert (sample_mods[1].id, -1) not in prevs
+
+def test_latest_vsn(sample_mod, db_session):
+    from sqlalchemy import inspect
+    sm = sample_mod
+    db_session.expire(sm)
+
+    assert sm.latest_vsn.index == 0
+    sm.name = 'changed'
+    log = sm.log_change(user=None)
+    db_session.commit()
+    assert log.index == 1
+    assert sm.latest_vsn == log
+    # Neither of these should have loaded the mod's whole history.
+    assert 'logs' in inspect(sm).unloaded
+
+def test_log_index_unique(sample_mod, db_session):
+    from sqlalchemy.exc import IntegrityError
+    from mcarch.model.mod.logs import LogMod
+    entry = LogMod(cur_id=sample_mod.id, index=0, name='dup')
+    db_session.add(entry)
+    with pytest.raises(IntegrityError):
+        db_session.flush()
+    db_session.rollback()
+
+def mod_state(mod):
+    """Summarizes the contents of a mod's tree so different trees can be compared."""
+    return (mod.name, mod.desc, [a.name for a in mod.authors], sorted(
+        (v.name, v.desc, [g.name for g in v.game_vsns],
+            [(f.stored.sha256, f.page_url) for f in v.files])
+        for v in mod.mod_vsns))
+
+def test_delta_log(app, sample_mod, db_session):
+    app.config['LOG_STORAGE'] = 'delta'
+    app.config['LOG_KEYFRAME_INTERVAL'] = 3
+    try:
+        sm = sample_mod
+        states = [mod_state(sm)]
+        def change():
+            db_session.commit()
+            sm.log_change(user=None)
+            db_session.commit()
+            states.append(mod_state(sm))
+
+        sm.name = 'changed'
+        change()
+        sm.mod_vsns.append(ModVersion(
+            name='6.9',
+            game_vsns=[GameVersion(name='a1.2.4')],
+            files=[ModFile(stored=StoredFile(name='test-6.9.jar', sha256='fake69'))]
+        ))
+        change()
+        sm.mod_vsns[0].files[0].page_url = 'https://example.com'
+        sm.mod_vsns[0].game_vsns = [sm.mod_vsns[1].game_vsns[0]]
+        change()
+        del sm.mod_vsns[1]
+        change()
+        sm.authors.append(ModAuthor(name='another'))
+        sm.mod_vsns[1].desc = 'changed'
+        change()
+
+        assert [l.keyframe for l in sm.logs] == [True, False, False, True, False, False]
+        assert len(sm.logs[1].mod_vsns) == 0
+        for log, state in zip(sm.logs, states):
+            assert mod_state(log.materialize()) == state
+        assert sm.logs[5].stored_diff['changes'][0][0] == 'authors'
+
+        draft = sm.make_draft(user=None)
+        assert draft.base_id == sm.logs[5].id
+        assert mod_state(draft) == states[5]
+
+        sm.revert_to(sm.logs[2])
+        assert mod_state(sm) == states[2]
+    finally:
+        app.config['LOG_STORAGE'] = 'snapshot'
+        app.config['LOG_KEYFRAME_INTERVAL'] = 20
+
+def test_make_keyframes(app, sample_mod, db_session):
+    from mcarch.model.mod.logs import LogMod
+    app.config['LOG_STORAGE'] = 'delta'
+    try:
+        sm = sample_mod
+        states = [mod_state(sm)]
+        sm.name = 'changed'
+        del sm.mod_vsns[0]
+        db_session.commit()
+        sm.log_change(user=None)
+        db_session.commit()
+        states.append(mod_state(sm))
+        sm.mod_vsns[0].desc = 'changed'
+        sm.log_change(user=None)
+        db_session.commit()
+        states.append(mod_state(sm))
+        assert [l.keyframe for l in sm.logs] == [True, False, False]
+
+        result = app.test_cli_runner().invoke(args=['log', 'keyframes'])
+        assert 'Stored 2 keyframes' in result.output
+        logs = LogMod.query.filter_by(cur_id=sm.id).order_by(LogMod.index).all()
+        assert [(l.keyframe, l.delta) for l in logs] == [(True, None)] * 3
+        for log, state in zip(logs, states):
+            assert mod_state(log) == state
+    finally:
+        app.config['LOG_STORAGE'] = 'snapshot'
+
+def test_keyword_search(sample_mods, db_session):
+    def search(kw): return [m.slug for m in Mod.search_query(keyword=kw).all()]
+    assert search('panic') == ['guide']
+    assert search('prefect') == ['guide']
+    assert search('guide-2.7') == ['guide']
+    assert search('nothing matches this') == []
+
+    # Name matches rank above matches in other fields.
+    db_session.add(Mod(name="Another", slug="another", desc="Not a test mod"))
+    db_session.flush()
+    assert search('test') == ['test', 'another']
+
+    # Renaming a file updates the search results.
+    stored = StoredFile.query.filter(StoredFile.name.like('guide-2.7%')).first()
+    stored.name = 'Towel 2.7.jar'
+    db_session.flush()
+    assert search('towel') == ['guide']
+
+def test_file_dedup(app, sample_mod, db_session):
+    from mcarch.model.mod.draft import DraftModFile
+    from mcarch.model.mod.logs import LogMod
+    from mcarch.model.counter import ChangeCounter
+    a = StoredFile(name='a.jar', sha256='h', b2_path='h/a.jar')
+    a_dup = StoredFile(name='a.jar', sha256='h', b2_path='h/a.jar')
+    a_copy = StoredFile(name='a.jar', sha256='h', b2_path='h/copy/a.jar')
+    a_empty = StoredFile(name='a.jar', sha256='h', b2_path=None)
+    b = StoredFile(name='b.jar', sha256='h', b2_path='h/b.jar')
+    vsn = sample_mod.mod_vsns[0]
+    vsn.files.append(ModFile(stored=a))
+    vsn.files.append(ModFile(stored=a_dup))
+    draft_files = [DraftModFile(stored=a_copy), DraftModFile(stored=a_empty),
+        DraftModFile(stored=b)]
+    db_session.add_all(draft_files)
+    # A file without a stored copy that has a lower ID than the one with it.
+    c_empty = StoredFile(name='c.jar', sha256='h2', b2_path=None)
+    db_session.add(c_empty)
+    db_session.flush()
+    c = StoredFile(name='c.jar', sha256='h2', b2_path='h2/c.jar')
+    vsn.files.append(ModFile(stored=c))
+    db_session.commit()
+    ids = (a.id, a_dup.id, a_copy.id, a_empty.id, b.id, c_empty.id, c.id)
+    c_file_id = vsn.files[-1].id
+    log = LogMod(cur_id=sample_mod.id, index=99, name='delta', keyframe=False,
+        delta={'fields': {}, 'changed': [{'uuid': str(vsn.uuid), 'fields': {}, 'added': [
+            {'uuid': 'file', 'cur_id': None, 'fields': {'stored': a_dup.id}, 'children': []}
+        ]}]})
+    db_session.add(log)
+    db_session.commit()
+    # The CLI replaces the session, so look objects up again rather than using these.
+    file_ids = [f.id for f in vsn.files[-3:-1]]
+    draft_file_ids = [f.id for f in draft_files]
+    log_id = log.id
+    counter = ChangeCounter.get('mods')
+
+    cli = app.test_cli_runner()
+    result = cli.invoke(args=['file', 'dedup'])
+    assert 'Would remap 1 references in mod_file' in result.output
+    assert 'Would remap 1 log entry deltas' in result.output
+    assert StoredFile.query.filter(StoredFile.id.in_(ids)).count() == 7
+
+    result = cli.invoke(args=['file', 'dedup', '--no-pretend'])
+    assert 'Deleted 1 duplicate stored files' in result.output
+    stored_ids = [f.stored_id for f in ModFile.query.filter(ModFile.id.in_(file_ids))]
+    assert stored_ids == [ids[0], ids[0]]
+    delta = LogMod.query.get(log_id).delta
+    assert delta['changed'][0]['added'][0]['fields']['stored'] == ids[0]
+    assert StoredFile.query.filter(StoredFile.id.in_(ids)).count() == 6
+    assert ChangeCounter.get('mods') == counter + 1
+
+    # Files with the same hash are only duplicates if they have the same name too. Files stored
+    # under another path are kept, and files with a stored copy are kept over ones without.
+    result = cli.invoke(args=['file', 'dedup', '--no-pretend', '--by', 'sha256'])
+    assert 'Remapped 1 references in draft_mod_file' in result.output
+    assert 'Deleted 2 duplicate stored files' in result.output
+    stored_ids = [DraftModFile.query.get(i).stored_id for i in draft_file_ids]
+    assert stored_ids == [ids[2], ids[0], ids[4]]
+    assert ModFile.query.get(c_file_id).stored.b2_path == 'h2/c.jar'
+    remaining = StoredFile.query.filter(StoredFile.id.in_(ids)).order_by(StoredFile.id).all()
+    assert [f.id for f in remaining] == [ids[0], ids[2], ids[4], ids[6]]
@@ -5,6 +5,10 @@ major problems.
 
 from flask import url_for
 from helpers.login import login_as, log_out, check_allowed
+from helpers.queries import count_queries
+from helpers.mods import add_versions
+
+from mcarch.model.mod import Mod, ModVersion
 
 def test_browse(client, sample_mods):
     rv = client.get('/mods')
@@ -58,3 +62,127 @@ def test_mod_revision_perm(client, sample_users, sample_mod):
     check_allowed(client, sample_users['archivist'], page, expect=True)
     check_allowed(client, sample_users['user'], page, expect=False)
 
+
+def test_mod_revision_delta(app, client, sample_users, sample_mod, db_session):
+    app.config['LOG_STORAGE'] = 'delta'
+    try:
+        sm = sample_mod
+        sm.mod_vsns[0].name = '4.2.1'
+        db_session.commit()
+        sm.log_change(user=None)
+        db_session.commit()
+    finally:
+        app.config['LOG_STORAGE'] = 'snapshot'
+    login_as(client, sample_users['admin'])
+    rv = client.get('/mods/{}/history/{}'.format(sm.slug, 1))
+    assert b'revision 1' in rv.data
+    assert b'4.2.1' in rv.data
+    assert b'test-4.2.0.jar' in rv.data
+
+
+def test_mod_page_query_count(client, sample_mods, db_session):
+    sm = sample_mods[1]
+    db_session.commit()
+    with count_queries() as small:
+        client.get('/mods/{}'.format(sm.slug))
+    add_versions(sm, 10)
+    db_session.commit()
+    with count_queries() as big:
+        rv = client.get('/mods/{}'.format(sm.slug))
+    assert b'big-9.9-server.jar' in rv.data
+    assert len(big) == len(small)
+
+def test_browse_query_count(client, sample_mods, db_session):
+    db_session.commit()
+    with count_queries() as small:
+        client.get('/mods')
+    for i in range(10):
+        db_session.add(Mod(name='Extra {}'.format(i), slug='extra-{}'.format(i),
+            mod_vsns=[ModVersion(name='1.0', game_vsns=sample_mods[0].mod_vsns[0].game_vsns)]))
+    db_session.commit()
+    with count_queries() as big:
+        rv = client.get('/mods')
+    assert b'Extra 9' in rv.data
+    assert len(big) == len(small)
+
+def test_markdown_cached(app, client, sample_mods, monkeypatch):
+    import mcarch.util.flask
+    calls = []
+    render = mcarch.util.flask.render_markdown
+    def counting_render(md):
+        calls.append(md)
+        return render(md)
+    monkeypatch.setattr(mcarch.util.flask, 'render_markdown', counting_render)
+    mcarch.util.flask.cached_markdown.cache_clear()
+
+    client.get('/mods')
+    rendered = len(calls)
+    assert rendered > 0
+    rv = client.get('/mods')
+    assert len(calls) == rendered
+    assert sample_mods[0].desc.encode('utf-8') in rv.data
+
+    with app.test_request_context():
+        assert mcarch.util.flask.safe_markdown('**hi** <script>') \
+            == '<p><strong>hi</strong> &lt;script&gt;</p>'
+
+    key = mcarch.util.flask.markdown_cache_key('**hi**')
+    monkeypatch.setattr(mcarch.util.flask, 'BLEACH_WHITELIST', ['p'])
+    assert mcarch.util.flask.markdown_cache_key('**hi**') != key
+
+def test_fragment_cache(client, sample_users, sample_mods, db_session, simple_cache):
+    db_session.commit()
+    login_as(client, sample_users['archivist'])
+
+    client.get('/mods')
+    with count_queries() as stmts:
+        rv = client.get('/mods')
+    assert sample_mods[0].name.encode('utf-8') in rv.data
+    assert not any('FROM mod' in s for s in stmts)
+
+    mod = sample_mods[1]
+    client.get('/mods/{}'.format(mod.slug))
+    rv = client.get('/mods/{}'.format(mod.slug))
+    assert mod.mod_vsns[0].name.encode('utf-8') in rv.data
+    # Buttons for the current user aren't part of the cached fragments.
+    assert b'Draft Change' in rv.data
+
+    # Logging a change replaces the cached fragments.
+    mod.name = 'Renamed Mod'
+    mod.log_change(user=None)
+    db_session.commit()
+    assert b'Renamed Mod' in client.get('/mods').data
+    assert b'Renamed Mod' in client.get('/mods/{}'.format(mod.slug)).data
+
+    log_out(client)
+    rv = client.get('/mods/{}'.format(mod.slug))
+    assert b'Renamed Mod' in rv.data
+    assert b'Draft Change' not in rv.data
+
+def test_page_cache_invalidation(client, sample_mods, db_session, simple_cache):
+    db_session.commit()
+    changed, other = sample_mods[1], sample_mods[0]
+    other_url = '/mods/{}'.format(other.slug)
+    client.get('/mods')
+    client.get('/mods/{}'.format(changed.slug))
+    client.get(other_url)
+    with count_queries() as stmts:
+        client.get('/mods/{}'.format(changed.slug))
+    assert not any('FROM mod' in s for s in stmts)
+
+    changed.name = 'Renamed Mod'
+    changed.log_change(user=None)
+    db_session.commit()
+    assert b'Renamed Mod' in client.get('/mods').data
+    assert b'Renamed Mod' in client.get('/mods/{}'.format(changed.slug)).data
+    # Pages of other mods stay cached.
+    with count_queries() as stmts:
+        client.get(other_url)
+    assert not any('FROM mod' in s for s in stmts)
+
+    # Changes that are rolled back don't invalidate anything.
+    other.log_change(user=None)
+    db_session.rollback()
+    with count_queries() as stmts:
+        client.get(other_url)
+    assert not any('FROM mod' in s for s in stmts)
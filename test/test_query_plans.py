@@ -0,0 +1,59 @@
+"""
+These tests check that the app's most common lookups are able to use the database's indexes.
+"""
+
+from mcarch.app import db
+from mcarch.model.mod import Mod, ModVersion, ModFile, GameVersion
+from mcarch.model.mod.logs import LogMod
+from mcarch.model.mod.draft import DraftMod
+from mcarch.model.file import StoredFile
+from mcarch.model.user import Session
+from helpers.queries import query_plan
+
+def test_files_by_hash_plan(db_session):
+    plan = query_plan(ModFile.query.join(StoredFile).filter(StoredFile.sha256 == 'abc'))
+    assert 'ix_stored_file_sha256' in plan
+    assert 'ix_mod_file_stored_id' in plan
+
+def test_files_by_name_plan(db_session):
+    plan = query_plan(ModFile.query.join(StoredFile).filter(StoredFile.name == 'test.jar'))
+    assert 'ix_stored_file_name' in plan
+    assert 'ix_mod_file_stored_id' in plan
+
+def test_mod_tree_plan(db_session):
+    plan = query_plan(ModVersion.query.filter(ModVersion.mod_id.in_([1, 2])))
+    assert 'ix_mod_version_mod_id' in plan
+    plan = query_plan(ModFile.query.filter(ModFile.version_id.in_([1, 2])))
+    assert 'ix_mod_file_version_id' in plan
+
+def test_game_version_mods_plan(sample_gvsns, db_session):
+    gvsn = sample_gvsns[0]
+    plan = query_plan(ModVersion.query.with_parent(gvsn, 'mod_vsns'))
+    assert 'ix_mod_version_for_game_version_game_vsn_id' in plan
+
+def test_draft_list_plans(db_session):
+    active = DraftMod.query.filter(DraftMod.archived_time.is_(None))
+    plan = query_plan(active.order_by(DraftMod.time_changed.desc()))
+    assert 'ix_draft_mod_active_time_changed' in plan
+    plan = query_plan(active.filter(DraftMod.user_id == 1)
+            .order_by(DraftMod.time_changed.desc()))
+    assert 'ix_draft_mod_active_user_id' in plan
+    plan = query_plan(active.filter(DraftMod.ready_time.isnot(None))
+            .order_by(DraftMod.ready_time.asc()))
+    assert 'ix_draft_mod_ready_time' in plan
+    plan = query_plan(DraftMod.query.filter(DraftMod.archived_time.isnot(None))
+            .order_by(DraftMod.archived_time.desc()))
+    assert 'ix_draft_mod_archived_time' in plan
+
+def unique_index(table, constraint):
+    """Returns the name of the index backing the unique constraint on `table` named
+    `constraint`. SQLite doesn't keep constraint names and numbers the indexes instead."""
+    if db.engine.dialect.name == 'postgresql':
+        return constraint
+    return 'sqlite_autoindex_{}_1'.format(table)
+
+def test_unique_lookup_plans(db_session):
+    plan = query_plan(LogMod.query.filter_by(cur_id=1).order_by(LogMod.index.desc()))
+    assert unique_index('log_mod', 'log_mod_cur_id_index_key') in plan
+    plan = query_plan(Session.query.filter_by(sess_id='abc', active=True))
+    assert unique_index('session', 'session_sess_id_key') in plan
@@ -0,0 +1,57 @@
+import b2sdk.api
+import b2sdk.account_info.in_memory
+
+from mcarch.app import create_app
+from mcarch.storage import B2Storage
+
+class B2Config:
+    TESTING = True
+    TEST_DATABASE_URI = 'sqlite://'
+    SECRET_KEY = 'secret!'
+    STORAGE_BACKEND = 'b2'
+    B2_KEY_ID = 'key'
+    B2_APP_KEY = 'secret'
+    B2_BUCKET_NAME = 'bucket'
+    B2_PUBLIC_URL = 'https://b2.example.com/file/bucket/'
+
+def test_b2_lazy(monkeypatch):
+    calls = []
+    class FakeB2Api:
+        def __init__(self, info): pass
+        def authorize_account(self, *args): calls.append(args)
+        def get_bucket_by_name(self, name): return name
+    monkeypatch.setattr(b2sdk.api, 'B2Api', FakeB2Api)
+    monkeypatch.setattr(b2sdk.account_info.in_memory, 'InMemoryAccountInfo', lambda: None)
+
+    app = create_app(B2Config)
+    storage = app.extensions['mcarch_storage']
+    assert isinstance(storage, B2Storage)
+    assert calls == []
+    assert storage.url('abc/test.jar') == 'https://b2.example.com/file/bucket/abc/test.jar'
+    assert calls == []
+
+    assert storage.bucket == 'bucket'
+    assert storage.bucket == 'bucket'
+    assert calls == [('production', 'key', 'secret')]
+
+def test_b2_stored_redirect(monkeypatch):
+    def no_b2(*args): raise AssertionError('B2 should not be used')
+    monkeypatch.setattr(b2sdk.api, 'B2Api', no_b2)
+
+    app = create_app(B2Config)
+    rv = app.test_client().get('/stored/abc/test.jar')
+    assert rv.status_code == 302
+    assert rv.location == 'https://b2.example.com/file/bucket/abc/test.jar'
+
+def test_b2_find():
+    from b2sdk.file_version import FileVersionInfo
+    class FakeBucket:
+        def ls(self, folder):
+            assert folder == 'abc'
+            for name in ['abc/test.jar', 'abc/test.jar.bak']:
+                yield FileVersionInfo('id-' + name, name, 42, None, None, None, 0, 'upload'), None
+    storage = B2Storage('key', 'secret', 'bucket', 'https://b2.example.com/file/bucket/')
+    storage._bucket = FakeBucket()
+    assert storage.find('abc/test.jar').id_ == 'id-abc/test.jar'
+    assert storage.stat('abc/test.jar') == 42
+    assert storage.stat('abc/other.jar') is None
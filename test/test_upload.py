@@ -0,0 +1,44 @@
+import io
+import os
+import hashlib
+
+import pytest
+from flask import request
+
+from mcarch.util.upload import HashingFile
+from mcarch.storage import LocalStorage
+from mcarch.model.file import gen_b2_path
+
+def test_upload_hashed(app):
+    data = b'not really a jar file' * 10000
+    with app.test_request_context('/', method='POST',
+            data={'file': (io.BytesIO(data), 'test.jar')}):
+        stream = request.files['file'].stream
+        assert isinstance(stream, HashingFile)
+        assert stream.sha256.hexdigest() == hashlib.sha256(data).hexdigest()
+        assert stream.sha1.hexdigest() == hashlib.sha1(data).hexdigest()
+        assert request.files['file'].read() == data
+
+        stream.flush()
+        path = stream.name
+        assert os.path.getsize(path) == len(data)
+    # The temporary file is removed once the request is done with it.
+    assert not os.path.exists(path)
+
+def test_local_storage(tmp_path):
+    src = tmp_path / 'src.jar'
+    src.write_bytes(b'some data')
+    storage = LocalStorage(str(tmp_path / 'storage'), 'https://files.example.com/')
+    path = gen_b2_path('src.jar', 'abc123')
+
+    assert storage.stat(path) == None
+    storage.put(path, str(src))
+    assert storage.stat(path) == len(b'some data')
+    with storage.get(path) as f:
+        assert f.read() == b'some data'
+    assert storage.url(path) == 'https://files.example.com/abc123/src.jar'
+    storage.delete(path)
+    assert storage.stat(path) == None
+
+    with pytest.raises(ValueError):
+        storage.stat('../src.jar')